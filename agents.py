@@ -1,14 +1,40 @@
 import agentpy as ap
-from owlready2 import *
-from flask import jsonify
+import json
 import math
+import time
+import numpy as np
 
+from metrics import agent_step_seconds
 
-class SecurityModel(ap.Model):
+from bus import MessageBus
+from geometry import DRONE_ALTITUDE, CameraGeometry, default_layout
+from rules import Rule, RuleEngine
+from trajectory import Trajectory
+
+
+class Restorable:
+    """Lets agentpy objects round-trip through pickle.
+
+    agentpy answers unknown attributes with an error message built from the
+    object's own attributes, which recurses when pickle probes for
+    __setstate__ on an instance whose __dict__ is still empty.
+    """
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+class SecurityModel(Restorable, ap.Model):
     def setup(self):
+        camera_count = self.p.get("cameras", 4)
+        self.bus = MessageBus(self.p.get("bus_capacity", 256))
         self.guard = ap.AgentList(self, 1, Guard)
-        self.cameras = ap.AgentList(self, 4, Camera)
-        self.drone = ap.AgentList(self, 1, Drone)
+        if self.p.get("camera_arrays", False):
+            # One array-backed object stands in for every camera agent
+            self.cameras = CameraArray(self, camera_count)
+        else:
+            self.cameras = ap.AgentList(self, camera_count, Camera)
+        self.drone = DroneFleet(self, self.p.get("drones", 1))
 
         self.guard.setup()
         self.cameras.setup()
@@ -16,38 +42,132 @@ class SecurityModel(ap.Model):
 
         for idx, camera in enumerate(self.cameras):
             camera.id = idx
-        self.channel = {
-            "subject": [""],
-            "content": "",
-        }
+        layout = self.p.get("camera_layout") or default_layout(camera_count, self.p.get("camera_spacing", 25.0))
+        if isinstance(layout, str):
+            with open(layout) as f:
+                layout = json.load(f)
+        if len(layout) != camera_count:
+            raise ValueError(f"camera_layout has {len(layout)} poses for {camera_count} cameras")
+        self.geometry = CameraGeometry(layout, self.p.get("grid_cell_size"))
+        # Camera that raised the latest alert; its zone is where an override sends the drone
+        self.alert_camera = None
+        # Optional eventlog.EventLog recording every tick
+        self.event_log = None
+
+    @property
+    def channel(self):
+        # Compatibility view: the last message published on the bus
+        return self.bus.latest
+
+    @channel.setter
+    def channel(self, value):
+        if not value:
+            self.bus.set_latest(value)
+        else:
+            self.bus.publish(value.get("subject"), value.get("content"))
+
+    def override_target(self):
+        if self.alert_camera is None:
+            return [0, DRONE_ALTITUDE, 0]
+        return self.geometry.zone_center(self.alert_camera)
+
+    def quiet_state(self):
+        # Everything a step could change apart from patrolling drones
+        from checkpoint import capture
+
+        state = capture(self)
+        del state["drones"]
+        return state
+
+    def fire_counters(self):
+        counters = [self.guard[0].rules.fires]
+        if isinstance(self.cameras, CameraArray):
+            counters.append(self.cameras.fires)
+        else:
+            counters += [camera.rules.fires for camera in self.cameras]
+        return counters
+
+    def advance(self, steps):
+        """Runs `steps` ticks and returns how many of them were skipped.
+
+        While the guard is idle and every drone patrols, a tick that leaves
+        the guard, the cameras and the bus exactly as they were is a fixed
+        point: every later tick only moves the drones along their routes. The
+        rest are then jumped over with skip(). Failed checks back off so a
+        busy model pays for them rarely.
+        """
+        wait, countdown = 1, 0
+        while steps > 0:
+            if steps == 1 or countdown or self.guard[0].drone_override or not self.drone.patrolling():
+                self.step()
+                steps -= 1
+                countdown = max(0, countdown - 1)
+                continue
+            before = self.quiet_state()
+            fires = [dict(counter) for counter in self.fire_counters()]
+            self.step()
+            steps -= 1
+            if steps and self.drone.patrolling() and self.quiet_state() == before:
+                repeat = [
+                    (counter, {name: counter[name] - old[name] for name in counter})
+                    for counter, old in zip(self.fire_counters(), fires)
+                ]
+                self.skip(steps, repeat)
+                return steps
+            countdown = wait
+            wait = min(wait * 2, 64)
+        return 0
+
+    def skip(self, steps, repeat_fires=()):
+        """Jumps `steps` ticks ahead from a fixed point (see advance)."""
+        self.drone.skip(steps)
+        for counter, fired in repeat_fires:
+            for name, count in fired.items():
+                counter[name] += count * steps
+        if self.event_log is not None:
+            self.event_log.after_skip(self, steps)
 
     def step(self):
+        if self.event_log is not None:
+            self.event_log.before_step()
+        started = time.perf_counter()
         self.guard.step()
+        guard_done = time.perf_counter()
         self.cameras.step()
+        cameras_done = time.perf_counter()
         self.drone.step()
+        drone_done = time.perf_counter()
 
+        agent_step_seconds.observe(guard_done - started, agent="guard")
+        agent_step_seconds.observe(cameras_done - guard_done, agent="cameras")
+        agent_step_seconds.observe(drone_done - cameras_done, agent="drone")
+        if self.event_log is not None:
+            self.event_log.after_step(self)
 
-class Guard(ap.Agent):
+
+class Guard(Restorable, ap.Agent):
     def setup(self):
         self.agentType = 1
-        self.actions = [
-            self.basic_analysis,
-            self.panoramic_analysis,
-            self.end_panoramic_analysis,
-            self.start_drone_override,
-            self.check_drone_detection,
-            self.stop_controlling_drone,
-            self.action_call_cops,
-        ]
-        self.rules = [
-            self.rule_basic_analysis,
-            self.rule_panoramic_analysis,
-            self.rule_end_panoramic_analysis,
-            self.rule_start_drone_override,
-            self.rule_check_drone_detection,
-            self.rule_stop_controlling_drone,
-            self.rule_action_call_cops,
-        ]
+        self.rules = RuleEngine(
+            self,
+            [
+                Rule(self.basic_analysis, self.rule_basic_analysis, reads=["alarm_count_begin"]),
+                Rule(self.panoramic_analysis, self.rule_panoramic_analysis, reads=["alarm_count_begin"]),
+                Rule(
+                    self.end_panoramic_analysis,
+                    self.rule_end_panoramic_analysis,
+                    reads=["initialize_panoramic_view", "drone_override_timer"],
+                ),
+                Rule(
+                    self.start_drone_override,
+                    self.rule_start_drone_override,
+                    reads=["alarm_count_begin", "drone_override"],
+                ),
+                Rule(self.check_drone_detection, self.rule_check_drone_detection, reads=["drone_override"]),
+                Rule(self.stop_controlling_drone, self.rule_stop_controlling_drone, reads=["personal_time"]),
+                Rule(self.action_call_cops, self.rule_action_call_cops, reads=["personal_time"]),
+            ],
+        )
         self.alarm_count_begin = 0
         self.alarm_count_end = 0
         self.initialize_panoramic_view = False
@@ -56,42 +176,43 @@ class Guard(ap.Agent):
         self.call_cops = False
         self.alert_checks = 0
         self.important_subjects = ["camera", "drone"]
-        self.personal_time = 30  # 10 steps for when he controls the drone
+        self.alarm_threshold = self.p.get("alarm_threshold", 3)
+        self.personal_time = self.p.get("personal_time", 30)  # 10 steps for when he controls the drone
+        self.inbox = self.model.bus.subscribe(["vision", "Drone"])
 
     def see(self):
-        if self.alarm_count_end >= 1:
-            return
-
-        subjects = self.model.channel["subject"]
-        content = self.model.channel["content"]
-
-        if subjects == ["vision"] and content == "intruder":
-            self.alarm_count_begin += 1
-            self.model.channel = {"subject": [""], "content": ""}
-        if subjects == ["Drone"] and content == "intruder":
-            self.alarm_count_end += 1
+        for message in self.inbox.poll():
+            if self.alarm_count_end >= 1:
+                return
+            if message["content"] != "intruder":
+                continue
+
+            if "vision" in message["topics"]:
+                self.alarm_count_begin += 1
+                self.model.bus.consume(message)
+            if "Drone" in message["topics"]:
+                self.alarm_count_end += 1
 
     def basic_analysis(self):
         self.drone_override = False
         self.initialize_panoramic_view = False
 
-    def rule_action_call_cops(self,act):
-        if self.personal_time == 3:
-            return act==self.action_call_cops
+    def rule_action_call_cops(self):
+        return self.personal_time == 3
 
     def action_call_cops(self):
         self.call_cops = True
 
-    def rule_basic_analysis(self, act):
-        return self.alarm_count_begin < 3 and act == self.basic_analysis
+    def rule_basic_analysis(self):
+        return self.alarm_count_begin < self.alarm_threshold
 
     def panoramic_analysis(self):
         self.initialize_panoramic_view = True
         self.drone_override = True
         self.drone_override_timer = 0
 
-    def rule_panoramic_analysis(self, act):
-        return self.alarm_count_begin >= 3 and act == self.panoramic_analysis
+    def rule_panoramic_analysis(self):
+        return self.alarm_count_begin >= self.alarm_threshold
 
     def end_panoramic_analysis(self):
         self.initialize_panoramic_view = False
@@ -99,43 +220,38 @@ class Guard(ap.Agent):
         self.drone_override_timer = 0
         self.alert_checks = 0
 
-    def rule_end_panoramic_analysis(self, act):
+    def rule_end_panoramic_analysis(self):
         return (
             self.initialize_panoramic_view == True
             and self.drone_override_timer >= 5
-            and act == self.end_panoramic_analysis
         )
 
     def start_drone_override(self):
         self.drone_override = True
         self.model.channel = {"subject": ["Guard"], "content": "drone_override"}
 
-    def rule_start_drone_override(self, act):
-        return (
-            self.alarm_count_begin >= 3
-            and not self.drone_override
-            and act == self.start_drone_override
-        )
+    def rule_start_drone_override(self):
+        return self.alarm_count_begin >= self.alarm_threshold and not self.drone_override
 
     def check_drone_detection(self):
         if (
-            self.model.channel["subject"] == ["Drone"]
-            and self.model.channel["content"] == "intruder"
+            self.model.channel.get("subject") == ["Drone"]
+            and self.model.channel.get("content") == "intruder"
         ):
             print("Intruder detected")
 
-    def rule_check_drone_detection(self, act):
-        return self.drone_override and act == self.check_drone_detection
+    def rule_check_drone_detection(self):
+        return self.drone_override
 
     def stop_controlling_drone(self):
         self.drone_override = False
         self.initialize_panoramic_view = False
-        self.personal_time = 30
+        self.personal_time = self.p.get("personal_time", 30)
         self.alarm_count_begin = 0
         self.alarm_count_end = 0
 
-    def rule_stop_controlling_drone(self, act):
-        return self.personal_time <= 0 and act == self.stop_controlling_drone
+    def rule_stop_controlling_drone(self):
+        return self.personal_time <= 0
 
 
 
@@ -152,10 +268,7 @@ class Guard(ap.Agent):
         self.next()
 
     def next(self):
-        for action in self.actions:
-            for rule in self.rules:
-                if rule(action):
-                    action()
+        self.rules.run()
 
     def give_info(self):
         return {
@@ -170,58 +283,62 @@ class Guard(ap.Agent):
         }
 
 
-class Camera(ap.Agent):
+class Camera(Restorable, ap.Agent):
     def setup(self):
         self.agentType = 2
-        self.actions = [self.lock_in, self.alert_guard, self.update_vision_result]
-        self.rules = [
-            self.rule_lock_in,
-            self.rule_alert_guard,
-            self.rule_update_vision_result,
-        ]
+        self.rules = RuleEngine(
+            self,
+            [
+                Rule(self.lock_in, self.rule_lock_in, reads=["locked", "detection", "alert_checks"]),
+                Rule(self.alert_guard, self.rule_alert_guard, reads=["detection", "locked"]),
+                Rule(self.update_vision_result),
+            ],
+        )
         self.id = None
         self.detection = None
         self.locked = False
         self.alert_checks = 0
+        self.vision_results = []
+        self.inbox = self.model.bus.subscribe(["drone", "vision_result"])
 
     def see(self):
-        subjects = self.model.channel["subject"]
-        content = self.model.channel["content"]
-
-        if subjects == ["drone"] and content == "intruder begin":
-            self.alert_checks += 1
-
-    def update_vision_result(self):
-        if (
-            self.model.channel["subject"] == ["vision_result"]
-            and self.model.channel["content"].get("id") == self.id
-        ):
-            self.detection = self.model.channel["content"].get("result")
-
-    def rule_update_vision_result(self, act):
-        return act == self.update_vision_result
+        for message in self.inbox.poll():
+            content = message["content"]
+            if "drone" in message["topics"] and content == "intruder begin":
+                self.alert_checks += 1
+            if (
+                "vision_result" in message["topics"]
+                and isinstance(content, dict)
+                and content.get("id") == self.id
+            ):
+                self.vision_results.append(content.get("result"))
+
+    def update_vision_result(self, result=None):
+        # /vision_result passes the result directly; otherwise apply what see() collected
+        if result is not None:
+            self.vision_results.append(result)
+        if self.vision_results:
+            self.detection = self.vision_results[-1]
+            self.vision_results = []
 
     def lock_in(self):
         self.locked = True
 
-    def rule_lock_in(self, act):
-        return (
-            not self.locked
-            and (self.detection == "YES" or self.alert_checks > 0)
-            and act == self.lock_in
-        )
+    def increase_alert_checks(self):
+        self.alert_checks += 1
+
+    def rule_lock_in(self):
+        return not self.locked and (self.detection == "YES" or self.alert_checks > 0)
 
     def alert_guard(self):
+        self.model.alert_camera = self.id
         self.model.channel = {"subject": ["vision"], "content": "intruder"}
 
-    def rule_alert_guard(self, act):
-        return self.detection == "YES" and self.locked and act == self.alert_guard
+    def rule_alert_guard(self):
+        return self.detection == "YES" and self.locked
 
     def next(self):
-        for action in self.actions:
-            for rule in self.rules:
-                if rule(action):
-                    action()
+        self.rules.run()
 
     def step(self):
         self.see()
@@ -236,128 +353,346 @@ class Camera(ap.Agent):
         }
 
 
-class Drone(ap.Agent):
+class CameraArray:
+    """Struct-of-arrays version of a list of Camera agents.
+
+    step() reproduces running Camera.step() on every camera in order, but as
+    a handful of array operations instead of one Python call per camera.
+    All cameras share one bus subscription since they follow the same subjects.
+    """
+
+    DETECTION_NONE = 0
+    DETECTION_YES = 1
+
+    def __init__(self, model, count):
+        self.model = model
+        self.count = count
+        # detection values are stored as codes into this table
+        self.detection_values = [None, "YES", "NO"]
+
     def setup(self):
-        self.agentType = 3
-        self.actions = [
-            self.alert_guard,
-            self.alert_guard_final,
-            self.move,
-            self.check_guard_orders,
-        ]
-        self.rules = [
-            self.rule_alert_guard,
-            self.rule_alert_guard_final,
-            self.rule_move,
-            self.rule_check_guard_orders,
+        self.locked = np.zeros(self.count, dtype=bool)
+        self.alert_checks = np.zeros(self.count, dtype=np.int64)
+        self.detection = np.zeros(self.count, dtype=np.int16)
+        self.inbox = self.model.bus.subscribe(["drone", "vision_result"])
+        # Same names as the per-camera RuleEngine counters
+        self.fires = {"lock_in": 0, "alert_guard": 0, "update_vision_result": 0}
+
+    def detection_code(self, value):
+        try:
+            return self.detection_values.index(value)
+        except ValueError:
+            self.detection_values.append(value)
+            return len(self.detection_values) - 1
+
+    def step(self):
+        intruder_begin = 0
+        vision_results = []
+        for message in self.inbox.poll():
+            content = message["content"]
+            if "drone" in message["topics"] and content == "intruder begin":
+                intruder_begin += 1
+            if "vision_result" in message["topics"] and isinstance(content, dict):
+                target = content.get("id")
+                if type(target) is int and 0 <= target < self.count:
+                    vision_results.append((target, content.get("result")))
+
+        if intruder_begin:
+            self.alert_checks += intruder_begin
+
+        yes = self.detection == self.DETECTION_YES
+        was_locked = int(np.count_nonzero(self.locked))
+        self.locked |= yes | (self.alert_checks > 0)
+        self.fires["lock_in"] += int(np.count_nonzero(self.locked)) - was_locked
+
+        # Every camera with a positive detection is locked by now and alerts
+        alerts = int(np.count_nonzero(yes))
+        if alerts:
+            self.model.alert_camera = int(np.flatnonzero(yes)[-1])
+        for _ in range(alerts):
+            self.model.channel = {"subject": ["vision"], "content": "intruder"}
+        self.fires["alert_guard"] += alerts
+
+        for target, result in vision_results:
+            self.detection[target] = self.detection_code(result)
+        self.fires["update_vision_result"] += self.count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, idx):
+        if not -self.count <= idx < self.count:
+            raise IndexError("camera index out of range")
+        return CameraView(self, idx % self.count)
+
+    def __iter__(self):
+        for idx in range(self.count):
+            yield CameraView(self, idx)
+
+    def give_info(self):
+        values = self.detection_values
+        return [
+            {"id": idx, "locked": locked, "alert_checks": checks, "detection": values[code]}
+            for idx, (locked, checks, code) in enumerate(
+                zip(self.locked.tolist(), self.alert_checks.tolist(), self.detection.tolist())
+            )
         ]
-        self.detection = None
-        self.pos = [0, 0, 0]  # Starting position
-        self.panoramic = False
-        self.target_pos = None
-        self.override_timer = 0
-        self.radius = 10
-        self.time_counter = 0
-        self.position_history = []
-        self.override_duration = 20  # 15 seconds / 3 seconds per step = 5 steps
-        self.guard_override = False
 
-    def rule_alert_guard(self, action):
-        return (
-            self.detection == "YES"
-            and not self.panoramic
-            and action == self.alert_guard
-        )
 
-    def rule_alert_guard_final(self, act):
-        return (
-            self.detection == "YES" and act == self.alert_guard_final
-        )
+class CameraView:
+    """Single-camera facade over a CameraArray row."""
 
-    def alert_guard(self):
-        self.model.channel = {"subject": ["vision"], "content": "intruder"}
+    def __init__(self, cameras, idx):
+        self.cameras = cameras
+        self.idx = idx
 
-    def alert_guard_final(self):
-        self.model.channel = {"subject": ["Drone"], "content": "intruder"}
+    @property
+    def id(self):
+        return self.idx
 
-    def move(self):
-        if self.guard_override:  # Move to the center if guard_override is True
-            if self.target_pos is None:
-                self.target_pos = [0, 40, 0]  # Move to the center
-                self.override_timer = 0
+    @id.setter
+    def id(self, value):
+        # ids are always the array index; kept so setup code can assign them
+        pass
 
-            self.override_timer += 1
-            progress = min(self.override_timer / self.override_duration, 1)
+    @property
+    def locked(self):
+        return bool(self.cameras.locked[self.idx])
 
-            # Move towards the target position
-            self.pos[0] = self.pos[0] + (self.target_pos[0] - self.pos[0]) * progress
-            self.pos[1] = self.pos[1] + (self.target_pos[1] - self.pos[1]) * progress
-            self.pos[2] = self.pos[2] + (self.target_pos[2] - self.pos[2]) * progress
+    @property
+    def alert_checks(self):
+        return int(self.cameras.alert_checks[self.idx])
+
+    @property
+    def detection(self):
+        return self.cameras.detection_values[self.cameras.detection[self.idx]]
+
+    def update_vision_result(self, result):
+        self.cameras.detection[self.idx] = self.cameras.detection_code(result)
+
+    def increase_alert_checks(self):
+        self.cameras.alert_checks[self.idx] += 1
+
+    def give_info(self):
+        return {
+            "id": self.id,
+            "locked": self.locked,
+            "alert_checks": self.alert_checks,
+            "detection": self.detection,
+        }
 
-            # Reset override after reaching the target
-            if self.override_timer >= self.override_duration:
-                self.guard_override = False
-                self.target_pos = None
-
-        else:  # Patrol movement
-            waypoints = [
-                [-50, 40, -50],  # Corner 1
-                [50, 40, -50],  # Corner 2
-                [50, 40, 50],  # Corner 3
-                [-50, 40, 50],  # Corner 4
-            ]
-            segment_time = 100
-            total_time = len(waypoints) * segment_time
-            current_time_in_route = self.time_counter % total_time
-
-            # Segment the route and progress between waypoints
-            segment_index = current_time_in_route // segment_time
-            next_segment_index = (segment_index + 1) % len(waypoints)
-            current_waypoint = waypoints[segment_index]
-            next_waypoint = waypoints[next_segment_index]
-
-            # Move between waypoints
-            progress_in_segment = (current_time_in_route % segment_time) / segment_time
-            self.pos[0] = (
-                current_waypoint[0]
-                + (next_waypoint[0] - current_waypoint[0]) * progress_in_segment
-            )
-            self.pos[1] = current_waypoint[1]
-            self.pos[2] = (
-                current_waypoint[2]
-                + (next_waypoint[2] - current_waypoint[2]) * progress_in_segment
-            )
 
-        # Update position history
-        self.position_history.append(self.pos.copy())
-        if len(self.position_history) > 10:
-            self.position_history.pop(0)
+# Square patrol, corner to corner
+PATROL_ROUTE = [[-50, 40, -50], [50, 40, -50], [50, 40, 50], [-50, 40, 50]]
 
-    def rule_move(self, act):
-        return act == self.move
 
-    def rule_check_guard_orders(self, act):
-        return act == self.check_guard_orders
+def route_positions(route, segment_time):
+    """Position at each tick of one lap: straight lines between waypoints, at waypoint height."""
+    waypoints = np.array(route, dtype=np.float64)
+    ticks = np.arange(len(route) * segment_time)
+    segment = ticks // segment_time
+    current = waypoints[segment]
+    following = waypoints[(segment + 1) % len(route)]
+    progress = (ticks % segment_time) / segment_time
+    positions = np.empty((len(ticks), 3))
+    positions[:, 0] = current[:, 0] + (following[:, 0] - current[:, 0]) * progress
+    positions[:, 1] = current[:, 1]
+    positions[:, 2] = current[:, 2] + (following[:, 2] - current[:, 2]) * progress
+    return positions
+
+
+class DroneFleet:
+    """Struct-of-arrays version of the drone agents.
+
+    Positions live in one (drones, 3) array and move with a few array
+    operations per tick. Each drone patrols its route from its own phase
+    offset; when the guard takes control, the drone nearest the override
+    target answers while the rest keep patrolling. Patrol position is a pure
+    function of the tick, which is what lets skip() jump ahead in O(1).
+    """
+
+    def __init__(self, model, count):
+        self.model = model
+        self.count = count
+
+    def setup(self):
+        p = self.model.p
+        routes = p.get("drone_routes") or [PATROL_ROUTE]
+        self.segment_time = p.get("segment_time", 100)
+        self.override_duration = p.get("override_duration", 20)  # 15 seconds / 3 seconds per step = 5 steps
+        self.radius = 10
+        self.time_counter = 0
+
+        # One lap of every route, tick by tick; a patrol position is then a single lookup
+        tables = [route_positions(route, self.segment_time) for route in routes]
+        periods = np.array([len(table) for table in tables])
+        self.patrol_table = np.concatenate(tables)
+        self.route = np.arange(self.count) % len(routes)
+        self.table_start = (np.cumsum(periods) - periods)[self.route]
+        self.period = periods[self.route]
+        phases = p.get("drone_phases")
+        if phases is None:
+            # Drones sharing a route are spread evenly along it
+            rank = np.arange(self.count) // len(routes)
+            sharing = (self.count - self.route + len(routes) - 1) // len(routes)
+            phases = rank * self.period // sharing
+        self.phase = np.asarray(phases, dtype=np.int64)
+
+        self.pos = np.zeros((self.count, 3))
+        self.target = np.zeros((self.count, 3))
+        self.has_target = np.zeros(self.count, dtype=bool)
+        self.override_timer = np.zeros(self.count, dtype=np.int64)
+        self.guard_override = np.zeros(self.count, dtype=bool)
+        self.detection = [None] * self.count
+        self.panoramic = [False] * self.count
+        self.trajectory = Trajectory(p.get("trajectory_capacity", 36000), width=3 * self.count)
+        # Same names as the old per-drone RuleEngine counters
+        self.fires = {"check_guard_orders": 0, "move": 0}
+
+    def patrol_positions(self, tick):
+        return self.patrol_table[self.table_start + (tick + self.phase) % self.period]
 
     def check_guard_orders(self):
-        if (
-            self.model.guard[0].drone_override == True
-        ):
-            self.guard_override = True
+        if self.model.guard[0].drone_override and not self.guard_override.any():
+            target = np.asarray(self.model.override_target(), dtype=np.float64)
+            nearest = int(np.argmin(np.linalg.norm(self.pos - target, axis=1)))
+            self.guard_override[nearest] = True
 
+    def move(self):
+        if self.guard_override.any():
+            overriding = self.guard_override.copy()
+            idx = np.flatnonzero(overriding)
+            fresh = idx[~self.has_target[idx]]
+            if len(fresh):
+                # Head for the alerting camera's zone, or the center if none alerted
+                self.target[fresh] = self.model.override_target()
+                self.has_target[fresh] = True
+                self.override_timer[fresh] = 0
+
+            self.override_timer[idx] += 1
+            progress = np.minimum(self.override_timer[idx] / self.override_duration, 1)
+            pos = self.pos[idx]
+            self.pos[idx] = pos + (self.target[idx] - pos) * progress[:, None]
+
+            # Reset override after reaching the target
+            done = idx[self.override_timer[idx] >= self.override_duration]
+            self.guard_override[done] = False
+            self.has_target[done] = False
+
+            patrolling = ~overriding
+            if patrolling.any():
+                self.pos[patrolling] = self.patrol_positions(self.time_counter)[patrolling]
+        else:
+            self.pos[:] = self.patrol_positions(self.time_counter)
+
+        self.trajectory.append(self.time_counter, self.pos.ravel())
 
     def step(self):
         self.time_counter += 1
         self.check_guard_orders()
         self.move()
+        self.fires["check_guard_orders"] += self.count
+        self.fires["move"] += self.count
+
+    def patrolling(self):
+        return not self.guard_override.any()
+
+    def skip(self, steps):
+        """Same as `steps` calls to step() while no drone is under guard control."""
+        self.time_counter += steps
+        self.pos[:] = self.patrol_positions(self.time_counter)
+        self.trajectory.append(self.time_counter, self.pos.ravel())
+        self.fires["check_guard_orders"] += self.count * steps
+        self.fires["move"] += self.count * steps
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, idx):
+        if not -self.count <= idx < self.count:
+            raise IndexError("drone index out of range")
+        return DroneView(self, idx % self.count)
+
+    def __iter__(self):
+        for idx in range(self.count):
+            yield DroneView(self, idx)
+
+    def give_info(self):
+        return [drone.give_info() for drone in self]
+
+
+def fleet_field(name):
+    # Shared by the whole fleet; kept per drone in the view's interface
+    return property(lambda view: getattr(view.fleet, name), lambda view, value: setattr(view.fleet, name, value))
+
+
+def drone_field(name, cast):
+    def get(view):
+        return cast(getattr(view.fleet, name)[view.idx])
+
+    def set_(view, value):
+        getattr(view.fleet, name)[view.idx] = value
+
+    return property(get, set_)
+
+
+class DroneView:
+    """Single-drone facade over a DroneFleet row, with the old Drone agent's interface."""
+
+    time_counter = fleet_field("time_counter")
+    segment_time = fleet_field("segment_time")
+    override_duration = fleet_field("override_duration")
+    radius = fleet_field("radius")
+    trajectory = fleet_field("trajectory")
+    detection = drone_field("detection", lambda value: value)
+    panoramic = drone_field("panoramic", bool)
+    override_timer = drone_field("override_timer", int)
+    guard_override = drone_field("guard_override", bool)
+
+    def __init__(self, fleet, idx):
+        self.fleet = fleet
+        self.idx = idx
+        self.model = fleet.model
+
+    @property
+    def pos(self):
+        return self.fleet.pos[self.idx].tolist()
+
+    @pos.setter
+    def pos(self, value):
+        self.fleet.pos[self.idx] = value
+
+    @property
+    def target_pos(self):
+        return self.fleet.target[self.idx].tolist() if self.fleet.has_target[self.idx] else None
+
+    @target_pos.setter
+    def target_pos(self, value):
+        self.fleet.has_target[self.idx] = value is not None
+        if value is not None:
+            self.fleet.target[self.idx] = value
+
+    def rule_alert_guard(self):
+        return self.detection == "YES" and not self.panoramic
+
+    def rule_alert_guard_final(self):
+        return self.detection == "YES"
+
+    def alert_guard(self):
+        self.model.channel = {"subject": ["vision"], "content": "intruder"}
+
+    def update_vision_result(self, result):
+        self.detection = result
+
+    def alert_guard_final(self):
+        self.model.channel = {"subject": ["Drone"], "content": "intruder"}
 
     def give_info(self):
         return {
             "position": self.pos,
             "detection": self.detection,
             "panoramic": self.panoramic,
-            "position_history": self.position_history,
             "override_timer": self.override_timer,
             "time_counter": self.time_counter,
             "guard_override": self.guard_override,
-        }
\ No newline at end of file
+        }
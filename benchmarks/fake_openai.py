@@ -0,0 +1,86 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Answers every request with YES or NO after an injected delay, so the vision
+pipeline can be measured without network or API cost.
+
+    python benchmarks/fake_openai.py --port 8599 --latency-ms 300
+    OPENAI_BASE_URL=http://127.0.0.1:8599/v1 python server.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=200.0, jitter_ms=0.0, yes_rate=0.1):
+        super().__init__(address, Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.yes_rate = yes_rate
+        self.requests = 0
+        self.images = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        content = body["messages"][0]["content"]
+        images = sum(1 for part in content if part.get("type") == "image_url")
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.images += images
+
+        delay = self.server.latency_ms + random.uniform(0, self.server.jitter_ms)
+        time.sleep(delay / 1000)
+
+        answers = ["YES" if random.random() < self.server.yes_rate else "NO" for _ in range(images)]
+        if images > 1:
+            text = "\n".join(f"{i}: {answer}" for i, answer in enumerate(answers, start=1))
+        else:
+            text = answers[0] if answers else "NO"
+        reply = json.dumps(
+            {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 85 * images + 30, "completion_tokens": 2 * images, "total_tokens": 87 * images + 30},
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port=0, **kwargs):
+    server = FakeOpenAI(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--yes-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    server = FakeOpenAI(("127.0.0.1", args.port), args.latency_ms, args.jitter_ms, args.yes_rate)
+    print(f"Fake OpenAI listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,248 @@
+"""Performance benchmarks for the simulation, the HTTP endpoints and the vision pipeline.
+
+    python benchmarks/run.py --out bench.json
+    python benchmarks/run.py --suite step --baseline bench.json
+
+Results are written as JSON. With --baseline, each result is compared with the
+matching one in an earlier run and the script exits 1 if any got worse than
+--tolerance.
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_openai  # noqa: E402
+
+# Which way is better for each metric, used when comparing with a baseline
+HIGHER_IS_BETTER = {"ticks_per_sec", "requests_per_sec", "frames_per_sec"}
+LOWER_IS_BETTER = {"p50_ms", "p99_ms"}
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {"p50_ms": None, "p99_ms": None}
+    p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+    return {"p50_ms": round(float(p50), 3), "p99_ms": round(float(p99), 3)}
+
+
+def bench_step(duration):
+    from agents import SecurityModel
+
+    results = []
+    for mode, counts in (("agents", [4, 64, 512]), ("arrays", [4, 512, 4096, 16384])):
+        for cameras in counts:
+            model = SecurityModel({"cameras": cameras, "camera_arrays": mode == "arrays"})
+            model.setup()
+            ticks = 0
+            started = time.perf_counter()
+            while time.perf_counter() - started < duration:
+                model.step()
+                ticks += 1
+            elapsed = time.perf_counter() - started
+            results.append(
+                {
+                    "name": "step",
+                    "params": {"mode": mode, "cameras": cameras},
+                    "ticks_per_sec": round(ticks / elapsed, 1),
+                }
+            )
+    return results
+
+
+def load(url, make_request, concurrency, duration):
+    """Hit `url` from `concurrency` threads for `duration` seconds."""
+    import requests
+
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        nonlocal errors
+        session = requests.Session()
+        mine, failed, n = [], 0, 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = make_request(session, url, index, n)
+                if response.status_code >= 400:
+                    failed += 1
+            except requests.RequestException:
+                failed += 1
+            mine.append(time.perf_counter() - started)
+            n += 1
+        with lock:
+            latencies.extend(mine)
+            errors += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        **percentiles(latencies),
+    }
+
+
+def serve_app():
+    import logging
+
+    from werkzeug.serving import make_server
+
+    import server
+    from agents import SecurityModel
+
+    server.model = SecurityModel({})
+    server.model.setup()
+    server.attach_model(server.model)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    http = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    return http, f"http://127.0.0.1:{http.server_port}"
+
+
+def random_frame(seed, size=256):
+    from PIL import Image
+
+    pixels = np.random.default_rng(seed).integers(0, 255, (size, size, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=75)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def bench_endpoints(base, frames, concurrency, duration):
+    requests_by_path = {
+        "/agents_info": lambda s, url, i, n: s.get(url),
+        "/vision_result": lambda s, url, i, n: s.post(
+            url, json={"agent_type": "camera", "id": 1 + i % 3, "result": "NO"}
+        ),
+        "/vision": lambda s, url, i, n: s.post(url, json={"image": frames[(i + n) % len(frames)]}),
+    }
+    results = []
+    for path, make_request in requests_by_path.items():
+        stats = load(base + path, make_request, concurrency, duration)
+        results.append({"name": "endpoint", "params": {"path": path, "concurrency": concurrency}, **stats})
+    return results
+
+
+def bench_vision(base, upstream, frames, concurrency, duration):
+    upstream.requests = upstream.images = 0
+    stats = load(
+        base + "/vision",
+        lambda s, url, i, n: s.post(url, json={"image": frames[(i * 7919 + n) % len(frames)]}),
+        concurrency,
+        duration,
+    )
+    return [
+        {
+            "name": "vision_e2e",
+            "params": {"upstream_latency_ms": upstream.latency_ms, "concurrency": concurrency},
+            "frames_per_sec": stats["requests_per_sec"],
+            "frames": stats["requests"],
+            "errors": stats["errors"],
+            "upstream_requests": upstream.requests,
+            "p50_ms": stats["p50_ms"],
+            "p99_ms": stats["p99_ms"],
+        }
+    ]
+
+
+def compare(results, baseline, tolerance):
+    previous = {json.dumps([r["name"], r["params"]], sort_keys=True): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(json.dumps([result["name"], result["params"]], sort_keys=True))
+        if old is None:
+            continue
+        for metric, value in result.items():
+            before = old.get(metric)
+            if not isinstance(value, (int, float)) or not before:
+                continue
+            if metric in HIGHER_IS_BETTER and value < before * (1 - tolerance):
+                regressions.append((result["name"], result["params"], metric, before, value))
+            elif metric in LOWER_IS_BETTER and value > before * (1 + tolerance):
+                regressions.append((result["name"], result["params"], metric, before, value))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite.")
+    parser.add_argument("--suite", default="step,endpoints,vision", help="Comma separated: step, endpoints, vision")
+    parser.add_argument("--duration", type=float, default=2.0, help="Seconds per measurement")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--upstream-latency-ms", type=float, default=200.0)
+    parser.add_argument("--out", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown")
+    args = parser.parse_args(argv)
+    suites = set(args.suite.split(","))
+
+    results = []
+    if "step" in suites:
+        results += bench_step(min(args.duration, 1.0))
+
+    if suites & {"endpoints", "vision"}:
+        upstream = fake_openai.start(latency_ms=args.upstream_latency_ms)
+        # Must be set before util.camera is imported by the server
+        os.environ["OPENAI_BASE_URL"] = upstream.base_url
+        os.environ.setdefault("VISION_CACHE", "0")
+        http, base = serve_app()
+        frames = [random_frame(seed) for seed in range(64)]
+        if "endpoints" in suites:
+            results += bench_endpoints(base, frames, args.concurrency, args.duration)
+        if "vision" in suites:
+            results += bench_vision(base, upstream, frames, args.concurrency * 4, args.duration)
+        http.shutdown()
+        upstream.shutdown()
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, params, metric, before, after in regressions:
+            print(f"REGRESSION {name} {params} {metric}: {before} -> {after}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import heapq
+import threading
+
+
+class Ring:
+    """Fixed-size buffer addressed by absolute message index."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self.published = 0
+
+    def append(self, item):
+        self.slots[self.published % self.capacity] = item
+        self.published += 1
+
+    def since(self, cursor):
+        # Returns (items, dropped) for everything published at or after cursor
+        start = max(cursor, self.published - self.capacity)
+        items = [self.slots[i % self.capacity] for i in range(start, self.published)]
+        return items, start - cursor
+
+
+class Subscription:
+    def __init__(self, bus, subjects):
+        self.bus = bus
+        self.subjects = list(subjects)
+        self.cursors = {subject: bus.ring(subject).published for subject in self.subjects}
+        self.dropped = 0
+
+    def poll(self):
+        """Messages published on our subjects since the last poll, oldest first."""
+        batches = []
+        for subject in self.subjects:
+            ring = self.bus.rings[subject]
+            cursor = self.cursors[subject]
+            if ring.published == cursor:
+                continue
+            items, dropped = ring.since(cursor)
+            self.cursors[subject] = ring.published
+            self.dropped += dropped
+            batches.append(items)
+
+        if not batches:
+            return []
+        if len(batches) == 1:
+            return batches[0]
+        # A message sent to several subjects we follow is delivered once
+        merged, last_seq = [], None
+        for message in heapq.merge(*batches, key=lambda m: m["seq"]):
+            if message["seq"] != last_seq:
+                merged.append(message)
+                last_seq = message["seq"]
+        return merged
+
+
+class MessageBus:
+    """Topic-indexed replacement for the single shared channel dict.
+
+    Every publish is kept in a bounded ring per subject, and each subscriber
+    reads from its own cursor, so simultaneous messages are all delivered.
+    `latest` is the last message published on any subject, which is what the
+    old `model.channel` used to hold.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.rings = {}
+        self.seq = 0
+        self.latest = {"subject": [""], "content": ""}
+        self.latest_seq = None
+        self.lock = threading.Lock()
+        # Optional callback(message) run after every publish, e.g. to push to streams
+        self.on_publish = None
+
+    def __getstate__(self):
+        # Snapshots carry the messages, not the lock or the stream callback
+        state = dict(self.__dict__)
+        del state["lock"]
+        state["on_publish"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def ring(self, subject):
+        ring = self.rings.get(subject)
+        if ring is None:
+            ring = self.rings[subject] = Ring(self.capacity)
+        return ring
+
+    def publish(self, subject, content):
+        subjects = subject if isinstance(subject, list) else [subject]
+        topics = tuple(dict.fromkeys(str(name) for name in subjects))
+        with self.lock:
+            message = {"seq": self.seq, "subject": subject, "topics": topics, "content": content}
+            self.seq += 1
+            for name in topics:
+                self.ring(name).append(message)
+            self.latest = {"subject": subject, "content": content}
+            self.latest_seq = message["seq"]
+        if self.on_publish is not None:
+            self.on_publish(message)
+        return message["seq"]
+
+    def consume(self, message):
+        # Blank the compatibility view if it still shows this message, the
+        # way agents used to clear the channel after handling it
+        with self.lock:
+            if self.latest_seq == message["seq"]:
+                self.latest = {"subject": [""], "content": ""}
+                self.latest_seq = None
+
+    def set_latest(self, value):
+        with self.lock:
+            self.latest = value
+            self.latest_seq = None
+
+    def subscribe(self, subjects):
+        with self.lock:
+            return Subscription(self, subjects)
+
+    def since(self, subject, cursor):
+        ring = self.rings.get(subject)
+        if ring is None:
+            return [], 0, 0
+        items, dropped = ring.since(cursor)
+        return items, dropped, ring.published
+
+    def info(self):
+        return {
+            "seq": self.seq,
+            "capacity": self.capacity,
+            "subjects": {name: ring.published for name, ring in self.rings.items()},
+        }
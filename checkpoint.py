@@ -0,0 +1,219 @@
+"""Compact, JSON-serializable captures of SecurityModel state.
+
+A capture holds the agents' state variables, the message bus and every
+subscription cursor: everything that decides what the next step does.
+The drone trajectory is history, not state, and is left out.
+"""
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from agents import CameraArray
+from bus import Ring
+
+GUARD_FIELDS = (
+    "alarm_count_begin",
+    "alarm_count_end",
+    "initialize_panoramic_view",
+    "drone_override",
+    "drone_override_timer",
+    "call_cops",
+    "alert_checks",
+    "alarm_threshold",
+    "personal_time",
+)
+CAMERA_FIELDS = ("id", "detection", "locked", "alert_checks", "vision_results")
+DRONE_FIELDS = (
+    "detection",
+    "pos",
+    "panoramic",
+    "target_pos",
+    "override_timer",
+    "radius",
+    "time_counter",
+    "override_duration",
+    "segment_time",
+    "guard_override",
+)
+
+
+def copy_value(value):
+    return list(value) if isinstance(value, (list, tuple)) else value
+
+
+def capture_fields(agent, fields):
+    return {name: copy_value(getattr(agent, name)) for name in fields}
+
+
+def capture_inbox(inbox):
+    return {"cursors": dict(inbox.cursors), "dropped": inbox.dropped}
+
+
+def capture_bus(bus):
+    with bus.lock:
+        rings = {}
+        for name, ring in bus.rings.items():
+            messages, _ = ring.since(max(0, ring.published - ring.capacity))
+            rings[name] = {
+                "published": ring.published,
+                "messages": [{**m, "topics": list(m["topics"])} for m in messages],
+            }
+        return {"seq": bus.seq, "latest": dict(bus.latest), "latest_seq": bus.latest_seq, "rings": rings}
+
+
+def capture_cameras(cameras):
+    if isinstance(cameras, CameraArray):
+        return {
+            "array": True,
+            "locked": cameras.locked.tolist(),
+            "alert_checks": cameras.alert_checks.tolist(),
+            "detection": cameras.detection.tolist(),
+            "detection_values": list(cameras.detection_values),
+            "inbox": capture_inbox(cameras.inbox),
+        }
+    return {
+        "array": False,
+        "agents": [{**capture_fields(c, CAMERA_FIELDS), "inbox": capture_inbox(c.inbox)} for c in cameras],
+    }
+
+
+def capture(model):
+    guard = model.guard[0]
+    return {
+        "t": model.t,
+        "alert_camera": model.alert_camera,
+        "guard": {**capture_fields(guard, GUARD_FIELDS), "inbox": capture_inbox(guard.inbox)},
+        "cameras": capture_cameras(model.cameras),
+        "drones": [capture_fields(drone, DRONE_FIELDS) for drone in model.drone],
+        "bus": capture_bus(model.bus),
+    }
+
+
+def restore_inbox(inbox, state):
+    inbox.cursors = dict(state["cursors"])
+    inbox.dropped = state["dropped"]
+
+
+def restore_bus(bus, state):
+    with bus.lock:
+        bus.rings = {}
+        for name, saved in state["rings"].items():
+            ring = bus.rings[name] = Ring(bus.capacity)
+            ring.published = saved["published"]
+            first = ring.published - len(saved["messages"])
+            for offset, message in enumerate(saved["messages"]):
+                ring.slots[(first + offset) % ring.capacity] = {**message, "topics": tuple(message["topics"])}
+        bus.seq = state["seq"]
+        bus.latest = dict(state["latest"])
+        bus.latest_seq = state["latest_seq"]
+
+
+def restore_cameras(cameras, state):
+    if state["array"] != isinstance(cameras, CameraArray) or len(cameras) != (
+        len(state["locked"]) if state["array"] else len(state["agents"])
+    ):
+        raise ValueError("Checkpoint was taken with a different camera layout")
+    if state["array"]:
+        cameras.locked[:] = np.asarray(state["locked"], dtype=bool)
+        cameras.alert_checks[:] = state["alert_checks"]
+        cameras.detection[:] = state["detection"]
+        cameras.detection_values = list(state["detection_values"])
+        restore_inbox(cameras.inbox, state["inbox"])
+        return
+    for camera, saved in zip(cameras, state["agents"]):
+        for name in CAMERA_FIELDS:
+            setattr(camera, name, copy_value(saved[name]))
+        restore_inbox(camera.inbox, saved["inbox"])
+        camera.rules.forget()
+
+
+def restore(model, state):
+    """Write a capture back into an already set-up model, reusing its agents."""
+    # Captures from before drone fleets hold a single "drone"
+    drones = state["drones"] if "drones" in state else [state["drone"]]
+    if len(drones) != len(model.drone):
+        raise ValueError("Checkpoint was taken with a different number of drones")
+    # Checks the camera layout before anything else is touched
+    restore_cameras(model.cameras, state["cameras"])
+    restore_bus(model.bus, state["bus"])
+    guard = model.guard[0]
+    for name in GUARD_FIELDS:
+        setattr(guard, name, state["guard"][name])
+    restore_inbox(guard.inbox, state["guard"]["inbox"])
+    guard.rules.forget()
+    for drone, saved in zip(model.drone, drones):
+        for name in DRONE_FIELDS:
+            setattr(drone, name, copy_value(saved[name]))
+    # Ticks after the capture would otherwise sit ahead of the ones stepped next
+    model.drone.trajectory.truncate(model.drone.time_counter)
+    model.t = state["t"]
+    model.alert_camera = state.get("alert_camera")
+
+
+NAME = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class CheckpointStore:
+    """Named captures kept as zlib-compressed JSON, in memory and optionally on disk.
+
+    The newest `max_entries` stay in memory; with `directory` every checkpoint
+    is also written there and survives restarts.
+    """
+
+    def __init__(self, directory=None, max_entries=64):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.ckpt")
+
+    def save(self, name, state):
+        data = zlib.compress(json.dumps(state, separators=(",", ":")).encode())
+        entry = {"name": name, "tick": state["drones"][0]["time_counter"], "created": time.time(), "bytes": len(data)}
+        with self.lock:
+            self.entries[name] = {**entry, "data": data}
+            self.entries.move_to_end(name)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        if self.directory:
+            with open(self._path(name), "wb") as f:
+                f.write(data)
+        return entry
+
+    def load(self, name):
+        with self.lock:
+            entry = self.entries.get(name)
+            data = entry["data"] if entry is not None else None
+        if data is None and self.directory and os.path.exists(self._path(name)):
+            with open(self._path(name), "rb") as f:
+                data = f.read()
+        return json.loads(zlib.decompress(data)) if data is not None else None
+
+    def delete(self, name):
+        with self.lock:
+            found = self.entries.pop(name, None) is not None
+        if self.directory and os.path.exists(self._path(name)):
+            os.remove(self._path(name))
+            found = True
+        return found
+
+    def list(self):
+        with self.lock:
+            listed = {name: {k: v for k, v in entry.items() if k != "data"} for name, entry in self.entries.items()}
+        if self.directory:
+            for filename in os.listdir(self.directory):
+                name, ext = os.path.splitext(filename)
+                if ext == ".ckpt" and name not in listed:
+                    path = os.path.join(self.directory, filename)
+                    listed[name] = {"name": name, "created": os.path.getmtime(path), "bytes": os.path.getsize(path), "on_disk_only": True}
+        return sorted(listed.values(), key=lambda entry: entry["created"])
@@ -0,0 +1,249 @@
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+Snapshot = namedtuple("Snapshot", ["version", "tick", "time", "state", "body"])
+
+
+def model_state(model):
+    """The /agents_info payload, copied so later steps cannot change it.
+
+    "drone" is the first drone; fleets of several also list all of them under "drones".
+    """
+    drones = [drone.give_info() for drone in model.drone]
+    for drone in drones:
+        drone["position"] = list(drone["position"])
+    state = {
+        "channel": dict(model.channel),
+        "guard": model.guard[0].give_info(),
+        "cameras": [camera.give_info() for camera in model.cameras],
+        "drone": drones[0],
+    }
+    if len(drones) > 1:
+        state["drones"] = drones
+    return state
+
+
+def list_delta(old_items, new_items):
+    changes = {}
+    for idx, item in enumerate(new_items):
+        old_item = old_items[idx] if idx < len(old_items) else {}
+        if item != old_item:
+            changes[str(idx)] = {k: v for k, v in item.items() if old_item.get(k) != v}
+    return changes
+
+
+def apply_list_delta(items, changes):
+    items = list(items)
+    for idx, fields in changes.items():
+        idx = int(idx)
+        if idx < len(items):
+            items[idx] = {**items[idx], **fields}
+        else:
+            items.append(fields)
+    return items
+
+
+def state_delta(old, new):
+    """Fields of `new` that differ from `old`, keyed like the full payload."""
+    changes = {}
+    if old["channel"] != new["channel"]:
+        changes["channel"] = new["channel"]
+    for key in ("guard", "drone"):
+        fields = {k: v for k, v in new[key].items() if old[key].get(k) != v}
+        if fields:
+            changes[key] = fields
+
+    # Camera ids are their indexes
+    for key in ("cameras", "drones"):
+        items = list_delta(old.get(key, []), new.get(key, []))
+        if items:
+            changes[key] = items
+    return changes
+
+
+def apply_delta(state, delta):
+    """Inverse of state_delta: `state` with `delta` applied, as a new dict."""
+    new = {
+        "channel": delta.get("channel", state["channel"]),
+        "guard": {**state["guard"], **delta.get("guard", {})},
+        "drone": {**state["drone"], **delta.get("drone", {})},
+        "cameras": apply_list_delta(state["cameras"], delta.get("cameras", {})),
+    }
+    if "drones" in state or "drones" in delta:
+        new["drones"] = apply_list_delta(state.get("drones", []), delta.get("drones", {}))
+    return new
+
+
+class StateStore:
+    """Versioned model snapshots.
+
+    The version only moves when the published state actually changes, so it
+    doubles as an ETag. A short history of snapshots backs `since=` deltas.
+    """
+
+    def __init__(self, history=64):
+        self.history = OrderedDict()
+        self.history_size = history
+        self.deltas = OrderedDict()
+        self.current = None
+        self.current_raw = None
+        self.cond = threading.Condition()
+        # Callbacks(snapshot) run for every new version
+        self.listeners = []
+
+    def publish(self, model, tick):
+        state = model_state(model)
+        body = json.dumps(state).encode()
+        with self.cond:
+            current = self.current
+            if current is not None and self.current_raw == body:
+                # Nothing changed; keep the version so ETags still match
+                self.current = current._replace(tick=tick, time=time.time())
+                return self.current
+            version = current.version + 1 if current is not None else 1
+            self.current_raw = body
+            body = body[:-1] + b', "version": %d}' % version
+            self.current = Snapshot(version, tick, time.time(), state, body)
+            self.history[version] = self.current
+            while len(self.history) > self.history_size:
+                self.history.popitem(last=False)
+            self.cond.notify_all()
+            snapshot = self.current
+        for listener in self.listeners:
+            listener(snapshot)
+        return snapshot
+
+    def wait_newer(self, version, timeout):
+        # Long-poll: block until the version passes `version` or timeout
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.current.version <= version:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            return self.current
+
+    def delta(self, since, snapshot):
+        """Changes from version `since` to `snapshot`, or None if `since` is too old."""
+        key = (since, snapshot.version)
+        with self.cond:
+            cached = self.deltas.get(key)
+            old = self.history.get(since)
+        if cached is not None:
+            return cached
+        if old is None:
+            return None
+
+        delta = {
+            "version": snapshot.version,
+            "since": since,
+            "changes": state_delta(old.state, snapshot.state),
+        }
+        with self.cond:
+            self.deltas[key] = delta
+            while len(self.deltas) > self.history_size:
+                self.deltas.popitem(last=False)
+        return delta
+
+
+class SimulationClock:
+    """Steps the model at a fixed rate on its own thread.
+
+    After each tick it publishes a new snapshot to the store, so readers can
+    serve state without touching the model or its lock.
+    """
+
+    def __init__(self, get_model, lock, store, hz=10.0):
+        self.get_model = get_model
+        self.lock = lock
+        self.store = store
+        self.hz = hz
+        self.speed = 1.0
+        self.running = threading.Event()
+        self.running.set()
+        self.stopped = threading.Event()
+        self.tick = 0
+        self.stats = {"ticks": 0, "overruns": 0, "skipped": 0, "max_step_ms": 0.0, "total_step_ms": 0.0}
+        with lock:
+            store.publish(get_model(), 0)
+        self.thread = threading.Thread(target=self._loop, name="simulation-clock", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.running.set()
+
+    def pause(self):
+        self.running.clear()
+
+    def resume(self):
+        self.running.set()
+
+    def set_speed(self, multiplier):
+        if multiplier <= 0:
+            raise ValueError("Speed multiplier must be positive")
+        self.speed = multiplier
+
+    @property
+    def period(self):
+        return 1.0 / (self.hz * self.speed)
+
+    def step_now(self, steps=1):
+        # Explicit steps from the API go through the same lock and snapshot
+        with self.lock:
+            model = self.get_model()
+            skipped = model.advance(steps)
+            self.tick += steps
+            self.store.publish(model, self.tick)
+        return skipped
+
+    def refresh(self):
+        with self.lock:
+            self.store.publish(self.get_model(), self.tick)
+
+    def _loop(self):
+        next_tick = time.monotonic()
+        while not self.stopped.is_set():
+            if not self.running.is_set():
+                self.running.wait()
+                next_tick = time.monotonic()
+                continue
+
+            started = time.monotonic()
+            self.step_now()
+            elapsed = time.monotonic() - started
+            self._record(elapsed)
+
+            period = self.period
+            next_tick += period
+            now = time.monotonic()
+            if now > next_tick:
+                # Overran: drop the missed ticks instead of bursting to catch up
+                missed = int((now - next_tick) / period)
+                self.stats["overruns"] += 1
+                self.stats["skipped"] += missed
+                next_tick += missed * period
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+    def _record(self, elapsed):
+        ms = elapsed * 1000
+        self.stats["ticks"] += 1
+        self.stats["total_step_ms"] += ms
+        self.stats["max_step_ms"] = max(self.stats["max_step_ms"], ms)
+
+    def info(self):
+        ticks = self.stats["ticks"]
+        return {
+            **self.stats,
+            "hz": self.hz,
+            "speed": self.speed,
+            "paused": not self.running.is_set(),
+            "tick": self.tick,
+            "mean_step_ms": self.stats["total_step_ms"] / ticks if ticks else 0.0,
+        }
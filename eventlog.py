@@ -0,0 +1,333 @@
+"""Append-only binary log of simulation inputs and per-tick state, with replay.
+
+Layout: MAGIC, then records of
+
+    <u32 payload length> <u8 kind> <u64 tick> <payload: compact JSON>
+
+START and KEYFRAME records hold the model parameters and a full checkpoint;
+their (tick, offset) pairs are also appended to "<log>.idx" so a reader can
+seek to any tick without scanning. INPUT records are everything the outside
+world did to the model, STEP records the state delta of each tick and MESSAGE
+records the channel writes agents made during that tick. A SKIP record stands
+for a run of quiet ticks jumped over at once (SecurityModel.advance); its tick
+is the last one.
+
+Replaying needs neither Flask nor OpenAI:
+
+    python eventlog.py events.log --to 500 --verify
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+import checkpoint
+from clock import apply_delta, model_state, state_delta
+
+MAGIC = b"SECLOG1\n"
+RECORD = struct.Struct("<IBQ")
+INDEX = struct.Struct("<QQ")
+START, INPUT, STEP, KEYFRAME, MESSAGE, SKIP = range(6)
+KIND_NAMES = {START: "start", INPUT: "input", STEP: "step", KEYFRAME: "keyframe", MESSAGE: "message", SKIP: "skip"}
+
+
+def encode(payload):
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def apply_input(model, op, data):
+    """Apply one outside input to the model. The server and replay both go through here."""
+    if op == "channel":
+        model.channel = data
+    elif op == "vision_result":
+        result = data["result"]
+        if data["agent_type"] == "drone":
+            model.drone[0].update_vision_result(result)
+            subject = "drone"
+        else:
+            model.cameras[data["id"]].update_vision_result(result)
+            subject = "camera"
+        model.channel = {"subject": subject, "content": result}
+    elif op == "camera_check":
+        model.cameras[data["id"]].increase_alert_checks()
+    elif op == "trigger_panoramic":
+        model.guard[0].panoramic_analysis()
+    else:
+        raise ValueError(f"Unknown input {op!r}")
+
+
+def build_model(params):
+    from agents import SecurityModel
+
+    model = SecurityModel(params)
+    model.setup()
+    return model
+
+
+class EventLog:
+    """Writer. attach() a model, then log its inputs; steps log themselves."""
+
+    def __init__(self, path, keyframe_every=100):
+        self.path = path
+        self.keyframe_every = keyframe_every
+        self.lock = threading.Lock()
+        self.tick = 0
+        self.stepping = False
+        self.previous = None
+        self.params = None
+        self.stats = {"records": 0, "keyframes": 0}
+
+        if os.path.exists(path) and os.path.getsize(path):
+            reader = EventLogReader(path)
+            end, last_tick = reader.scan_end()
+            reader.close()
+            self.tick = last_tick
+            if end < os.path.getsize(path):
+                # Drop a record torn by a crash so new ones stay readable
+                os.truncate(path, end)
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "wb")
+            self.file.write(MAGIC)
+        self.offset = self.file.tell()
+        self.index = open(path + ".idx", "ab")
+
+    def attach(self, model):
+        """Start a segment for `model`: log its full state, then follow its steps and messages.
+
+        Attaching the same model again (after its state was restored) only starts a new segment.
+        """
+        if model.event_log is not self:
+            model.event_log = self
+            forward = model.bus.on_publish
+
+            def on_publish(message):
+                if self.stepping:
+                    self.write(MESSAGE, {"seq": message["seq"], "subject": message["subject"], "content": message["content"]})
+                if forward is not None:
+                    forward(message)
+
+            model.bus.on_publish = on_publish
+        with self.lock:
+            self.params = dict(model.p)
+            self.previous = model_state(model)
+            self._write_frame(START, model)
+            self.file.flush()
+
+    def write(self, kind, payload):
+        with self.lock:
+            self._write(kind, payload)
+
+    def input(self, op, data):
+        with self.lock:
+            self._write(INPUT, {"op": op, "data": data})
+            self.file.flush()
+
+    def before_step(self):
+        self.stepping = True
+
+    def after_step(self, model):
+        self.stepping = False
+        state = model_state(model)
+        with self.lock:
+            self.tick += 1
+            self._write(STEP, state_delta(self.previous, state))
+            self.previous = state
+            if self.tick % self.keyframe_every == 0:
+                self._write_frame(KEYFRAME, model)
+            self.file.flush()
+
+    def after_skip(self, model, steps):
+        state = model_state(model)
+        with self.lock:
+            first = self.tick
+            self.tick += steps
+            self._write(SKIP, {"steps": steps, "delta": state_delta(self.previous, state)})
+            self.previous = state
+            if self.tick // self.keyframe_every > first // self.keyframe_every:
+                self._write_frame(KEYFRAME, model)
+            self.file.flush()
+
+    def _write(self, kind, payload):
+        data = encode(payload)
+        offset = self.offset
+        self.file.write(RECORD.pack(len(data), kind, self.tick))
+        self.file.write(data)
+        self.offset += RECORD.size + len(data)
+        self.stats["records"] += 1
+        return offset
+
+    def _write_frame(self, kind, model):
+        offset = self._write(kind, {"params": self.params, "state": checkpoint.capture(model)})
+        self.index.write(INDEX.pack(self.tick, offset))
+        self.index.flush()
+        self.stats["keyframes"] += 1
+
+    def info(self):
+        with self.lock:
+            return {**self.stats, "path": self.path, "tick": self.tick, "bytes": self.offset, "keyframe_every": self.keyframe_every}
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+            self.index.close()
+
+
+class EventLogReader:
+    """Memory-mapped reader that replays a log through SecurityModel."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an event log")
+        self.mismatches = []
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def records(self, offset=len(MAGIC)):
+        """(offset, kind, tick, payload bytes) for each complete record from `offset`."""
+        buf = self.map
+        end = len(buf)
+        while offset + RECORD.size <= end:
+            length, kind, tick = RECORD.unpack_from(buf, offset)
+            start = offset + RECORD.size
+            if start + length > end:
+                return
+            yield offset, kind, tick, buf[start : start + length]
+            offset = start + length
+
+    def scan_end(self):
+        """(end offset of the last complete record, its tick), reading headers only."""
+        buf = self.map
+        offset, tick = len(MAGIC), 0
+        while offset + RECORD.size <= len(buf):
+            length, _, record_tick = RECORD.unpack_from(buf, offset)
+            if offset + RECORD.size + length > len(buf):
+                break
+            offset += RECORD.size + length
+            tick = record_tick
+        return offset, tick
+
+    def keyframes(self):
+        """Sorted (tick, offset) of every START and KEYFRAME record."""
+        index_path = self.path + ".idx"
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                data = f.read()
+            data = data[: len(data) - len(data) % INDEX.size]
+            frames = [entry for entry in INDEX.iter_unpack(data) if entry[1] < len(self.map)]
+        else:
+            frames = [(tick, offset) for offset, kind, tick, _ in self.records() if kind in (START, KEYFRAME)]
+        return sorted(frames)
+
+    def seek_offset(self, tick):
+        # Last frame at or before `tick`; frames share ticks with the START of a new segment
+        best = None
+        for frame_tick, offset in self.keyframes():
+            if frame_tick > tick:
+                break
+            best = offset
+        if best is None:
+            raise ValueError(f"No keyframe at or before tick {tick}")
+        return best
+
+    def replay(self, start=None, end=None, verify=False):
+        """Yields (tick, model) after every step with start <= tick <= end.
+
+        With verify, each replayed state is compared with the logged one and
+        differing ticks are collected in `mismatches`. An `end` inside a skip
+        replays only the part of the skip up to it.
+        """
+        offset = self.seek_offset(start) if start is not None else len(MAGIC)
+        model = expected = None
+        for _, kind, tick, data in self.records(offset):
+            if end is not None and tick > end:
+                if kind == SKIP and model is not None:
+                    first = tick - json.loads(data)["steps"]
+                    if first < end:
+                        model.skip(end - first)
+                        if start is None or end >= start:
+                            yield end, model
+                return
+            if kind == MESSAGE:
+                continue
+            payload = json.loads(data)
+            if kind in (START, KEYFRAME):
+                if kind == START or model is None:
+                    model = build_model(payload["params"])
+                    checkpoint.restore(model, payload["state"])
+                    expected = model_state(model)
+                elif verify and encode(checkpoint.capture(model)) != encode(payload["state"]):
+                    self.mismatches.append(tick)
+            elif model is None:
+                continue
+            elif kind == INPUT:
+                apply_input(model, payload["op"], payload["data"])
+            elif kind in (STEP, SKIP):
+                if kind == STEP:
+                    model.step()
+                else:
+                    model.skip(payload["steps"])
+                if verify:
+                    expected = apply_delta(expected, payload if kind == STEP else payload["delta"])
+                    if model_state(model) != expected:
+                        self.mismatches.append(tick)
+                        expected = model_state(model)
+                if start is None or tick >= start:
+                    yield tick, model
+
+    def state_at(self, tick):
+        """The model as it was right after step `tick`, including ticks inside a skip."""
+        offset = self.seek_offset(tick)
+        for _, kind, frame_tick, data in self.records(offset):
+            if kind in (START, KEYFRAME):
+                if frame_tick == tick:
+                    payload = json.loads(data)
+                    model = build_model(payload["params"])
+                    checkpoint.restore(model, payload["state"])
+                    return model
+            break
+        for step_tick, model in self.replay(tick, tick):
+            if step_tick == tick:
+                return model
+        raise ValueError(f"Tick {tick} is not in the log")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a SecurityModel event log.")
+    parser.add_argument("path")
+    parser.add_argument("--from", dest="start", type=int, help="First tick to replay (seeks via keyframes)")
+    parser.add_argument("--to", dest="end", type=int, help="Last tick to replay")
+    parser.add_argument("--verify", action="store_true", help="Compare every replayed tick with the log")
+    args = parser.parse_args(argv)
+
+    reader = EventLogReader(args.path)
+    started = time.perf_counter()
+    ticks, model, last_tick = 0, None, None
+    for last_tick, model in reader.replay(args.start, args.end, verify=args.verify):
+        ticks += 1
+    elapsed = time.perf_counter() - started
+    summary = {
+        "ticks": ticks,
+        "last_tick": last_tick,
+        "seconds": round(elapsed, 3),
+        "ticks_per_sec": round(ticks / elapsed, 1) if elapsed else None,
+        "keyframes": len(reader.keyframes()),
+    }
+    if args.verify:
+        summary["mismatched_ticks"] = reader.mismatches
+    if model is not None:
+        summary["state"] = model_state(model)
+    print(json.dumps(summary, indent=2))
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
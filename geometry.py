@@ -0,0 +1,191 @@
+"""Camera poses, coverage sectors and a uniform-grid index over them.
+
+Coverage lives on the ground plane (x, z); y is height, as in the drone's
+waypoints. A camera sees a circular sector: everything within `range` of
+its position and within `fov` / 2 of its heading. `yaw` is measured in
+degrees from +x towards +z.
+"""
+import math
+
+import numpy as np
+
+DRONE_ALTITUDE = 40
+CAMERA_HEIGHT = 4
+
+
+def default_layout(count, spacing=25.0):
+    """Cameras on a square lattice centred on the origin, each facing the centre."""
+    side = max(1, math.ceil(math.sqrt(count)))
+    offset = (side - 1) * spacing / 2
+    layout = []
+    for idx in range(count):
+        x = (idx % side) * spacing - offset
+        z = (idx // side) * spacing - offset
+        layout.append(
+            {
+                "position": [x, CAMERA_HEIGHT, z],
+                "yaw": math.degrees(math.atan2(-z, -x)),
+                "fov": 90.0,
+                "range": 2 * spacing,
+            }
+        )
+    return layout
+
+
+class Buckets:
+    """Items grouped by integer grid cell, stored as one sorted array."""
+
+    def __init__(self, ix, iz, items):
+        self.x0 = int(ix.min()) if len(ix) else 0
+        self.z0 = int(iz.min()) if len(iz) else 0
+        self.x1 = int(ix.max()) if len(ix) else -1
+        self.z1 = int(iz.max()) if len(iz) else -1
+        keys = self.key(ix, iz)
+        order = np.argsort(keys, kind="stable")
+        self.items = items[order]
+        cells, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+        self.cells = dict(zip(cells.tolist(), zip(starts.tolist(), (starts + counts).tolist())))
+
+    def key(self, ix, iz):
+        return (ix - self.x0) * (self.z1 - self.z0 + 1) + (iz - self.z0)
+
+    def get(self, ix, iz):
+        if not (self.x0 <= ix <= self.x1 and self.z0 <= iz <= self.z1):
+            return None
+        span = self.cells.get(int(self.key(ix, iz)))
+        return None if span is None else self.items[span[0] : span[1]]
+
+
+class CameraGeometry:
+    """Camera poses with a uniform grid over coverage and one over positions.
+
+    The coverage grid lists each camera in every cell its sector's bounding
+    box touches, so "which cameras see P" tests only the cameras of P's cell.
+    The nearest-camera search walks rings of cells outwards from P and stops
+    once no unvisited cell can hold anything closer.
+    """
+
+    def __init__(self, layout, cell_size=None):
+        self.layout = layout
+        self.positions = np.array([camera["position"] for camera in layout], dtype=np.float64).reshape(-1, 3)
+        yaw = np.radians([camera.get("yaw", 0.0) for camera in layout])
+        self.heading = np.stack([np.cos(yaw), np.sin(yaw)], axis=1)
+        self.half_fov = np.radians([camera.get("fov", 90.0) for camera in layout]) / 2
+        self.cos_half_fov = np.cos(self.half_fov)
+        self.range = np.array([camera.get("range", 50.0) for camera in layout], dtype=np.float64)
+        if cell_size is None:
+            cell_size = float(np.median(self.range)) if len(layout) else 1.0
+        self.cell_size = max(cell_size, 1e-6)
+
+        ids = np.arange(len(layout))
+        ground = self.positions[:, [0, 2]]
+        self.by_position = Buckets(*self.cell(ground).T, ids)
+
+        low, high = self.sector_bounds(ground, yaw)
+        first, last = self.cell(low), self.cell(high)
+        widths = last - first + 1
+        per_camera = widths[:, 0] * widths[:, 1]
+        owner = np.repeat(ids, per_camera)
+        # Position of each (camera, cell) pair inside its camera's box
+        local = np.arange(per_camera.sum()) - np.repeat(np.cumsum(per_camera) - per_camera, per_camera)
+        ix = first[owner, 0] + local // widths[owner, 1]
+        iz = first[owner, 1] + local % widths[owner, 1]
+        self.by_coverage = Buckets(ix, iz, owner)
+
+    def sector_bounds(self, ground, yaw):
+        # A sector's extremes are its apex, its two arc ends and any axis direction inside the arc
+        angles = [yaw - self.half_fov, yaw + self.half_fov]
+        inside = []
+        for axis in np.arange(4) * (math.pi / 2):
+            offset = (axis - yaw + math.pi) % (2 * math.pi) - math.pi
+            angles.append(np.full(len(yaw), axis))
+            inside.append(np.abs(offset) <= self.half_fov)
+        inside = [np.ones(len(yaw), dtype=bool)] * 2 + inside
+        xs = [ground[:, 0]]
+        zs = [ground[:, 1]]
+        for angle, mask in zip(angles, inside):
+            xs.append(np.where(mask, ground[:, 0] + self.range * np.cos(angle), ground[:, 0]))
+            zs.append(np.where(mask, ground[:, 1] + self.range * np.sin(angle), ground[:, 1]))
+        xs, zs = np.stack(xs), np.stack(zs)
+        return np.stack([xs.min(0), zs.min(0)], axis=1), np.stack([xs.max(0), zs.max(0)], axis=1)
+
+    def cell(self, ground):
+        return np.floor(np.asarray(ground) / self.cell_size).astype(np.int64)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def covers(self, ids, point):
+        """Mask over `ids` of the cameras whose sector contains `point`."""
+        dx = point[0] - self.positions[ids, 0]
+        dz = point[2] - self.positions[ids, 2]
+        distance = np.hypot(dx, dz)
+        facing = self.heading[ids, 0] * dx + self.heading[ids, 1] * dz
+        return (distance <= self.range[ids]) & (facing >= self.cos_half_fov[ids] * distance)
+
+    def cameras_seeing(self, point):
+        ix, iz = self.cell([point[0], point[2]])
+        candidates = self.by_coverage.get(ix, iz)
+        if candidates is None:
+            return []
+        return candidates[self.covers(candidates, point)].tolist()
+
+    def nearest(self, point):
+        """(camera id, distance) of the camera closest to `point`, or (None, None)."""
+        if not len(self):
+            return None, None
+        point = np.asarray(point, dtype=np.float64)
+        cx, cz = self.cell([point[0], point[2]])
+        grid = self.by_position
+        # Rings that lie wholly outside the occupied cells are empty
+        first_ring = max(0, grid.x0 - cx, cx - grid.x1, grid.z0 - cz, cz - grid.z1)
+        last_ring = max(abs(cx - grid.x0), abs(cx - grid.x1), abs(cz - grid.z0), abs(cz - grid.z1))
+        best, best_distance = None, math.inf
+        for ring in range(first_ring, last_ring + 1):
+            for ix, iz in ring_cells(cx, cz, ring, grid):
+                ids = grid.get(ix, iz)
+                if ids is None:
+                    continue
+                distances = np.linalg.norm(self.positions[ids] - point, axis=1)
+                closest = int(np.argmin(distances))
+                if distances[closest] < best_distance or (
+                    distances[closest] == best_distance and ids[closest] < best
+                ):
+                    best, best_distance = int(ids[closest]), float(distances[closest])
+            # Cells of the next ring are at least `ring` whole cells away
+            if best_distance <= ring * self.cell_size:
+                break
+        return best, best_distance
+
+    def zone_center(self, camera_id):
+        """Centroid of the camera's coverage sector, at drone altitude."""
+        half = self.half_fov[camera_id]
+        reach = self.range[camera_id] * (2 * math.sin(half) / (3 * half) if half > 0 else 1.0)
+        x, _, z = self.positions[camera_id]
+        heading = self.heading[camera_id]
+        return [float(x + heading[0] * reach), DRONE_ALTITUDE, float(z + heading[1] * reach)]
+
+    def info(self):
+        cells = len(self.by_coverage.cells)
+        return {
+            "cameras": len(self),
+            "cell_size": self.cell_size,
+            "coverage_cells": cells,
+            "cameras_per_cell": len(self.by_coverage.items) / cells if cells else 0.0,
+        }
+
+
+def ring_cells(cx, cz, ring, grid):
+    """Cells at Chebyshev distance `ring` from (cx, cz) that lie inside the grid's bounds."""
+    if ring == 0:
+        yield cx, cz
+        return
+    xs = range(max(cx - ring, grid.x0), min(cx + ring, grid.x1) + 1)
+    for iz in (cz - ring, cz + ring):
+        if grid.z0 <= iz <= grid.z1:
+            for ix in xs:
+                yield ix, iz
+    for ix in (cx - ring, cx + ring):
+        if grid.x0 <= ix <= grid.x1:
+            for iz in range(max(cz - ring + 1, grid.z0), min(cz + ring - 1, grid.z1) + 1):
+                yield ix, iz
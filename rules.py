@@ -0,0 +1,70 @@
+from operator import attrgetter
+
+
+class Rule:
+    """An action plus the condition that fires it.
+
+    `reads` lists the agent attributes the condition depends on. When none of
+    them changed since the last evaluation, the previous answer is reused.
+    A rule without a condition always fires.
+    """
+
+    def __init__(self, action, condition=None, reads=()):
+        self.action = action
+        self.condition = condition
+        self.name = action.__name__
+        self.reads = tuple(reads)
+
+
+class RuleEngine:
+    """Fires an agent's rules in declaration order with one lookup per rule.
+
+    Replaces scanning every rule for every action: each action is bound to its
+    own rule once, so a step costs O(rules) instead of O(actions * rules).
+    """
+
+    def __init__(self, agent, rules):
+        self.table = []
+        for rule in rules:
+            getter = attrgetter(*rule.reads) if rule.reads else None
+            self.table.append([rule.name, rule.action, rule.condition, getter, _UNSET, False])
+        self.fires = {rule.name: 0 for rule in rules}
+        self.evaluations = 0
+        self.reused = 0
+        self.agent = agent
+
+    def run(self):
+        agent = self.agent
+        fires = self.fires
+        for entry in self.table:
+            name, action, condition, getter, last_state, last_result = entry
+            if condition is None:
+                holds = True
+            elif getter is None:
+                holds = condition()
+                self.evaluations += 1
+            else:
+                state = getter(agent)
+                if state == last_state:
+                    holds = last_result
+                    self.reused += 1
+                else:
+                    holds = bool(condition())
+                    entry[4] = state
+                    entry[5] = holds
+                    self.evaluations += 1
+            if holds:
+                action()
+                fires[name] += 1
+
+    def forget(self):
+        # Drop memoized conditions, e.g. after the agent's state was restored
+        for entry in self.table:
+            entry[4] = _UNSET
+            entry[5] = False
+
+    def info(self):
+        return {"fires": dict(self.fires), "evaluations": self.evaluations, "reused": self.reused}
+
+
+_UNSET = object()
@@ -1,17 +1,270 @@
-from flask import Flask, Response, request, jsonify
-from agents import SecurityModel
-from util.camera import process_image
+import time
+
+BOOT_STARTED = time.perf_counter()
+
+import atexit
+import json
+import os
+import resource
+import sys
+import threading
+import uuid
+
+from flask import Flask, Response, g, got_request_exception, request, jsonify
+from clock import SimulationClock, StateStore
+from sessions import SESSION_ID, SessionPrefix, SessionRegistry
+from shared_state import (
+    CommandClient,
+    CommandServer,
+    SharedStateReader,
+    SnapshotSegment,
+)
+import metrics
+from stream import StreamHub, parse_filters, sse_stream, websocket_stream
+from util.camera import (
+    process_image,
+    cache as vision_cache,
+    motion_gate as vision_motion_gate,
+    scheduler as vision_scheduler,
+    batcher as vision_batcher,
+    prefilter as vision_prefilter,
+    preprocessor as vision_preprocessor,
+)
+from util.vision_jobs import VisionJobs
+
+try:
+    from flask_sock import Sock
+except ImportError:  # WebSocket streaming is optional; SSE works without it
+    Sock = None
+
+# agents (agentpy, which pulls in pandas, scipy and matplotlib) and sweep are
+# imported on first use, so reader workers never load them
+IMPORT_SECONDS = time.perf_counter() - BOOT_STARTED
 
 app = Flask(__name__)
+# /s/<session>/... is the path-prefix spelling of the X-Session-Id header
+app.wsgi_app = SessionPrefix(app.wsgi_app)
+MAX_FRAME_BYTES = int(os.getenv("MAX_FRAME_BYTES", 4 * 1024 * 1024))
+# Guards model.step() and model replacement; readers of clock snapshots skip it
+model_lock = threading.RLock()
+state_store = StateStore()
+stream_hub = StreamHub()
+state_store.listeners.append(stream_hub.publish_state)
+clock = None
+# eventlog.EventLog for the global model when EVENT_LOG is set
+event_log = None
+# checkpoint.CheckpointStore, created on first use
+checkpoints = None
+
+# standalone: one process does everything (default)
+# owner: runs the simulation and publishes snapshots to shared memory
+# reader: WSGI worker that serves reads from shared memory and forwards writes
+SERVER_ROLE = os.getenv("SERVER_ROLE", "standalone")
+SHM_NAME = os.getenv("SHM_NAME", "nuclea_state")
+COMMAND_ADDRESS = os.getenv("COMMAND_ADDRESS", "/tmp/nuclea_commands.sock")
+COMMAND_AUTHKEY = os.getenv("COMMAND_AUTHKEY", "nuclea").encode()
+shared_reader = None
+command_client = None
+if SERVER_ROLE == "reader":
+    command_client = CommandClient(COMMAND_ADDRESS, COMMAND_AUTHKEY)
+
+
+def model_parameters():
+    return {
+        "cameras": int(os.getenv("CAMERA_COUNT", 4)),
+        "camera_arrays": os.getenv("CAMERA_ARRAYS", "0") == "1",
+        "drones": int(os.getenv("DRONE_COUNT", 1)),
+        # Path to a JSON list of camera poses; a lattice is used when unset
+        "camera_layout": os.getenv("CAMERA_LAYOUT") or None,
+    }
+
+
+def new_model():
+    from agents import SecurityModel
+
+    new = SecurityModel(model_parameters())
+    new.setup()
+    return new
+
+
+# Requests without a session id use the global `model` below, which is the
+# only one driven by the clock and mirrored to streams and shared memory
+sessions = SessionRegistry(
+    new_model,
+    max_live=int(os.getenv("SESSION_MAX_LIVE", 16)),
+    idle_timeout=float(os.getenv("SESSION_IDLE_TIMEOUT", 0)),
+    snapshot_dir=os.getenv("SESSION_SNAPSHOT_DIR") or None,
+)
+vision_jobs = VisionJobs(
+    process_image,
+    max_workers=int(os.getenv("VISION_WORKERS", 4)),
+    max_pending=int(os.getenv("VISION_MAX_PENDING", 32)),
+)
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.before_request
+def bind_session():
+    session_id = request.headers.get("X-Session-Id")
+    if not session_id:
+        return None
+    if not SESSION_ID.match(session_id):
+        return jsonify({"error": "Invalid session id"}), 400
+    g.session_id = session_id
+    # Reader workers forward session requests; the owner holds the models
+    if SERVER_ROLE != "reader" and request.endpoint not in GLOBAL_VIEWS | {None}:
+        g.session = sessions.acquire(session_id)
+
+
+@app.teardown_request
+def release_session(exc):
+    session = g.pop("session", None)
+    if session is not None:
+        sessions.release(session)
+
+
+def current_session():
+    return g.get("session")
+
+
+def current_model():
+    session = current_session()
+    return model if session is None else session.model
+
+
+def current_lock():
+    # Held while reading the request's model so a clock tick or another request can't step it halfway
+    session = current_session()
+    return model_lock if session is None else session.lock
+
+
+def record_input(target, op, data):
+    from eventlog import apply_input
+
+    if target is not model:
+        # A session's model, only reachable from inside its request
+        session = current_session()
+        with session.lock:
+            result = apply_input(target, op, data)
+            session.store.publish(target, None)
+            return result
+    # Logged under model_lock so inputs land in the log in the order they
+    # were applied relative to ticks, and only once they applied cleanly
+    with model_lock:
+        result = apply_input(target, op, data)
+        if event_log is not None:
+            event_log.input(op, data)
+        # Long-polls and readers see the input without waiting for a tick,
+        # which never comes while the clock is paused
+        if clock is not None:
+            clock.refresh()
+        else:
+            state_store.publish(model, None)
+        return result
+
+
+@app.after_request
+def record_latency(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        metrics.http_request_seconds.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or "unknown",
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
+
+
+def record_exception(sender, exception, **extra):
+    metrics.errors.inc(where="http", type=type(exception).__name__)
+
+
+got_request_exception.connect(record_exception, app)
+
+
+@metrics.registry.collector
+def model_metrics():
+    current = globals().get("model")
+    if current is None or getattr(current, "guard", None) is None:
+        return []
+    from agents import CameraArray, DroneFleet
+
+    fires = []
+    for name, agents in (("Guard", current.guard), ("Camera", current.cameras), ("Drone", current.drone)):
+        totals = {}
+        if isinstance(agents, (CameraArray, DroneFleet)):
+            totals = dict(agents.fires)
+        else:
+            for agent in agents:
+                for rule, count in agent.rules.fires.items():
+                    totals[rule] = totals.get(rule, 0) + count
+        fires += [({"agent": name, "rule": rule}, count) for rule, count in totals.items()]
+    return [("rule_fires_total", "counter", "Times each agent rule fired", fires)]
+
+
+@metrics.registry.collector
+def scheduler_metrics():
+    if vision_scheduler is None:
+        return []
+    info = vision_scheduler.info()
+    classes = info["classes"]
+    return [
+        ("vision_queue_depth", "gauge", "Frames waiting for an upstream slot", [({"priority": p}, n) for p, n in info["queued"].items()]),
+        ("vision_inflight", "gauge", "Upstream vision calls in progress", [({}, info["inflight"])]),
+        ("vision_admitted_total", "counter", "Upstream vision calls admitted", [({"priority": p}, c["admitted"]) for p, c in classes.items()]),
+        ("vision_dropped_total", "counter", "Upstream vision calls dropped at their deadline", [({"priority": p}, c["dropped"]) for p, c in classes.items()]),
+        ("vision_queue_wait_seconds_total", "counter", "Time admitted calls spent queued", [({"priority": p}, c["wait_seconds"]) for p, c in classes.items()]),
+    ]
+
+
+def max_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+@metrics.registry.collector
+def process_metrics():
+    return [
+        ("process_import_seconds", "gauge", "Time to import server.py and its dependencies", [({}, IMPORT_SECONDS)]),
+        ("process_max_rss_bytes", "gauge", "Peak resident memory", [({}, max_rss_bytes())]),
+        ("process_loaded_modules", "gauge", "Modules in sys.modules", [({}, len(sys.modules))]),
+    ]
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/")
 def home():
     return "Hello \t Welcome to the Drone Security System!"
 
+def step_model(steps=1):
+    """Steps the request's model; returns how many ticks were skipped ahead."""
+    session = current_session()
+    if session is not None:
+        with session.lock:
+            skipped = session.model.advance(steps)
+            session.store.publish(session.model, None)
+        return skipped
+    if clock is not None:
+        return clock.step_now(steps)
+    with model_lock:
+        skipped = model.advance(steps)
+        state_store.publish(model, None)
+    return skipped
+
+
 @app.route("/move_system")
 def move_system():
-    model.step()
+    step_model()
     return jsonify({"message": "System moved"})
 
 @app.route("/set_channel", methods=["POST"])
@@ -23,15 +276,98 @@ def set_channel():
     content = request.json.get("content")
     if not subject or not content:
         return jsonify({"error": "Missing 'subject' or 'content' in request body"}), 400
-    model.channel = {"subject": subject, "content": content}
-
-    return jsonify(model.channel)
+    with current_lock():
+        model = current_model()
+        record_input(model, "channel", {"subject": subject, "content": content})
+        return jsonify(model.channel)
 
 
 @app.route("/clean_channel", methods=["GET"])
 def clean_channel():
-    model.channel = {}
-    return jsonify(model.channel)
+    with current_lock():
+        model = current_model()
+        record_input(model, "channel", {})
+        return jsonify(model.channel)
+
+
+def apply_vision_message(message, subject, session_id=None):
+    # Same channel write the sync handlers have always done on a positive frame
+    if message == "YES":
+        channel = {"subject": [subject], "content": "intruder"}
+        if command_client is not None:
+            command_client.send(
+                {"method": "POST", "path": "/set_channel", "json": channel, "session": session_id}
+            )
+        elif session_id is None:
+            record_input(model, "channel", channel)
+        else:
+            # Async jobs finish after their request, so look the session up again
+            session = sessions.acquire(session_id)
+            try:
+                with session.lock:
+                    session.model.channel = channel
+            finally:
+                sessions.release(session)
+
+
+def vision_response(result, subject, **extra):
+    if "error" in result:
+        return jsonify(result), result.get("status", 500)
+
+    message = result.get("message")
+    if not message:
+        return jsonify({"error": "No result from vision processing"}), 500
+    apply_vision_message(message, subject, g.get("session_id"))
+    for stage in ("preprocess", "motion"):
+        if stage in result:
+            extra[stage] = result[stage]
+
+    return jsonify({"message": "Vision processing successful", "result": message, **extra})
+
+
+def on_vision_job_done(subject, session_id=None):
+    def callback(result):
+        message = result.get("message")
+        if "error" not in result and message:
+            apply_vision_message(message, subject, session_id)
+
+    return callback
+
+
+def camera_key(camera_id):
+    # Motion references are per camera, and per session when there is one
+    if camera_id is None:
+        return None
+    session_id = g.get("session_id")
+    return f"{session_id}/{camera_id}" if session_id else str(camera_id)
+
+
+def json_camera_id():
+    camera_id = request.json.get("id")
+    return camera_id if camera_id is not None else request.headers.get("X-Camera-Id")
+
+
+def frame_priority(subject):
+    # /visionFinal is the drone confirming an alert; other frames may say they come from the drone
+    if subject == "Drone":
+        return "drone_final"
+    source = request.headers.get("X-Frame-Source")
+    if source is None and request.is_json:
+        source = request.json.get("source")
+    return "drone" if source == "drone" else "camera"
+
+
+def frame_deadline():
+    deadline = request.headers.get("X-Frame-Deadline", type=float)
+    return min(deadline, 120) if deadline is not None and deadline > 0 else None
+
+
+def vision_options(subject, camera_id):
+    return {
+        "camera_id": camera_key(camera_id),
+        "priority": frame_priority(subject),
+        "deadline": frame_deadline(),
+    }
 
 
 @app.route("/vision", methods=["POST"])
@@ -42,18 +378,8 @@ def vision():
         return jsonify({"error": "Missing 'image' in request body"}), 400
 
     # Call process_image and handle the returned dictionary
-    result = process_image(image_data)
-    
-    if "error" in result:
-        return jsonify(result), 500
-    
-    message = result.get("message")
-    if not message:
-        return jsonify({"error": "No result from vision processing"}), 500
-    if message == "YES":
-        model.channel = {"subject": ["vision"], "content": "intruder"}
-    
-    return jsonify({"message": "Vision processing successful", "result": message})
+    result = process_image(image_data, **vision_options("vision", json_camera_id()))
+    return vision_response(result, "vision")
 
 @app.route("/visionFinal", methods=["POST"])
 def visionFinal():
@@ -63,18 +389,135 @@ def visionFinal():
         return jsonify({"error": "Missing 'image' in request body"}), 400
 
     # Call process_image and handle the returned dictionary
-    result = process_image(image_data)
-    
-    if "error" in result:
-        return jsonify(result), 500
-    
-    message = result.get("message")
-    if not message:
-        return jsonify({"error": "No result from vision processing"}), 500
-    if message == "YES":
-        model.channel = {"subject": ["Drone"], "content": "intruder"}
-    
-    return jsonify({"message": "Vision processing successful", "result": message})
+    result = process_image(image_data, **vision_options("Drone", json_camera_id()))
+    return vision_response(result, "Drone")
+
+
+def read_frame():
+    # Returns (frame, camera_id) with the JPEG as a memoryview over the request body
+    if request.mimetype == "multipart/form-data":
+        upload = request.files.get("image")
+        if upload is None:
+            return None, None
+        frame = memoryview(upload.read())
+        camera_id = request.form.get("id") or request.headers.get("X-Camera-Id")
+    else:
+        frame = memoryview(request.get_data(cache=False))
+        camera_id = request.headers.get("X-Camera-Id")
+    return frame, camera_id
+
+
+def frame_response(subject):
+    if request.mimetype not in ("image/jpeg", "multipart/form-data"):
+        return jsonify({"error": "Expected an 'image/jpeg' or multipart body"}), 415
+    if request.content_length and request.content_length > MAX_FRAME_BYTES:
+        return jsonify({"error": "Frame too large"}), 413
+
+    frame, camera_id = read_frame()
+    if frame is None or not len(frame):
+        return jsonify({"error": "Missing image in request body"}), 400
+    if frame[:2] != b"\xff\xd8":
+        return jsonify({"error": "Body is not a JPEG image"}), 400
+
+    extra = {"id": camera_id} if camera_id is not None else {}
+    return vision_response(process_image(frame, **vision_options(subject, camera_id)), subject, **extra)
+
+
+@app.route("/vision/frame", methods=["POST"])
+def vision_frame():
+    return frame_response("vision")
+
+
+@app.route("/visionFinal/frame", methods=["POST"])
+def vision_final_frame():
+    return frame_response("Drone")
+
+
+def submit_vision_job(subject):
+    image_data = request.json.get("image")
+
+    if not image_data:
+        return jsonify({"error": "Missing 'image' in request body"}), 400
+
+    job_id = vision_jobs.submit(
+        image_data,
+        on_done=on_vision_job_done(subject, g.get("session_id")),
+        **vision_options(subject, json_camera_id()),
+    )
+    if job_id is None:
+        return jsonify({"error": "Vision queue is full, retry later"}), 503
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+
+@app.route("/vision/submit", methods=["POST"])
+def vision_submit():
+    return submit_vision_job("vision")
+
+
+@app.route("/visionFinal/submit", methods=["POST"])
+def vision_final_submit():
+    return submit_vision_job("Drone")
+
+
+@app.route("/vision/jobs/<job_id>", methods=["GET"])
+def vision_job(job_id):
+    job = vision_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(vision_jobs.describe(job))
+
+
+@app.route("/vision/jobs/<job_id>/wait", methods=["GET"])
+def vision_job_wait(job_id):
+    timeout = min(request.args.get("timeout", 30, type=float), 120)
+    job = vision_jobs.wait(job_id, timeout)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(vision_jobs.describe(job))
+
+
+@app.route("/vision/cache", methods=["GET", "DELETE"])
+def vision_cache_info():
+    if vision_cache is None:
+        return jsonify({"error": "Vision cache is disabled"}), 404
+    if request.method == "DELETE":
+        vision_cache.clear()
+    return jsonify(vision_cache.info())
+
+
+@app.route("/vision/batch", methods=["GET"])
+def vision_batch_info():
+    if vision_batcher is None:
+        return jsonify({"error": "Vision batching is disabled"}), 404
+    return jsonify(vision_batcher.info())
+
+
+@app.route("/vision/prefilter", methods=["GET"])
+def vision_prefilter_info():
+    if vision_prefilter is None:
+        return jsonify({"error": "Vision prefilter is disabled"}), 404
+    return jsonify(vision_prefilter.info())
+
+
+@app.route("/vision/preprocess", methods=["GET"])
+def vision_preprocess_info():
+    if vision_preprocessor is None:
+        return jsonify({"error": "Vision preprocessing is disabled"}), 404
+    return jsonify(vision_preprocessor.info())
+
+
+@app.route("/vision/motion", methods=["GET"])
+def vision_motion_info():
+    if vision_motion_gate is None:
+        return jsonify({"error": "Motion gating is disabled"}), 404
+    return jsonify(vision_motion_gate.info())
+
+
+@app.route("/vision/scheduler", methods=["GET"])
+def vision_scheduler_info():
+    if vision_scheduler is None:
+        return jsonify({"error": "Vision scheduler is disabled"}), 404
+    return jsonify(vision_scheduler.info())
 
 
 @app.route("/vision_result", methods=["POST"])
@@ -89,21 +532,21 @@ def vision_result():
             400,
         )
 
-    if agent_type == "drone":
-        model.drone[0].update_vision_result(result)
-        subject = "drone"
-    elif agent_type == "camera":
-        if not agent_id:
-            return jsonify({"error": "Missing 'id' for camera agent"}), 400
-        model.cameras[agent_id].update_vision_result(result)
-        subject = "camera"
-    else:
+    if agent_type == "camera" and not agent_id:
+        return jsonify({"error": "Missing 'id' for camera agent"}), 400
+    if agent_type not in ("drone", "camera"):
         return jsonify({"error": "Invalid agent_type"}), 400
+    with current_lock():
+        model = current_model()
+        if agent_type == "camera" and (
+            not isinstance(agent_id, int) or not 0 <= agent_id < len(model.cameras)
+        ):
+            return jsonify({"error": "Invalid camera ID"}), 400
 
-    model.channel = {"subject": subject, "content": result}
-    return jsonify(
-        {"message": "Vision result updated successfully", "channel": model.channel}
-    )
+        record_input(model, "vision_result", {"agent_type": agent_type, "id": agent_id, "result": result})
+        return jsonify(
+            {"message": "Vision result updated successfully", "channel": model.channel}
+        )
 
 
 @app.route("/camera_check", methods=["POST"])
@@ -111,103 +554,627 @@ def camera_info():
     camera_id = request.json.get("id")
     if not camera_id:
         return jsonify({"error": "Missing 'id' in request body"}), 400
-    camera = model.cameras[camera_id]
-    if not camera:
-        return jsonify({"error": "Invalid camera ID"}, 400)
-    camera.increase_alert_checks()
-    return jsonify(camera.give_info().json)
+    with current_lock():
+        model = current_model()
+        if not isinstance(camera_id, int) or not 0 <= camera_id < len(model.cameras):
+            return jsonify({"error": "Invalid camera ID"}), 400
+        record_input(model, "camera_check", {"id": camera_id})
+        return jsonify(model.cameras[camera_id].give_info())
 
 
 @app.route("/test")  # Testing route
 def test():
-
-    model.guard[0].panoramic_analysis()
-    return model.guard[0].give_info()
+    with current_lock():
+        model = current_model()
+        record_input(model, "trigger_panoramic", {})
+        return model.guard[0].give_info()
 
 
 @app.route("/channel")
 def channel():
-    return model.channel
+    with current_lock():
+        return jsonify(current_model().channel)
 
 
-@app.route("/agents_info")
-def agents_info():
-    guard_info = model.guard[0].give_info()
-    cameras_info = [camera.give_info() for camera in model.cameras]
-    drone_info = model.drone[0].give_info()
-    model.step()
+@app.route("/bus")
+def bus_info():
+    with current_lock():
+        return jsonify(current_model().bus.info())
 
+
+@app.route("/bus/<subject>")
+def bus_messages(subject):
+    since = request.args.get("since", 0, type=int)
+    with current_lock():
+        messages, dropped, cursor = current_model().bus.since(subject, since)
     return jsonify(
         {
-            "channel": model.channel,
-            "guard": (
-                guard_info.get_json()
-                if isinstance(guard_info, Response)
-                else guard_info
-            ),
-            "cameras": [
-                cam.get_json() if isinstance(cam, Response) else cam
-                for cam in cameras_info
+            "subject": subject,
+            "messages": [
+                {"seq": m["seq"], "subject": m["subject"], "content": m["content"]}
+                for m in messages
             ],
-            "drone": (
-                drone_info.get_json()
-                if isinstance(drone_info, Response)
-                else drone_info
-            ),
+            "dropped": dropped,
+            "cursor": cursor,
         }
     )
 
 
+@app.route("/agents_info")
+def agents_info():
+    session = current_session()
+    if session is not None:
+        # Sessions have no clock, so polling drives them like the original server
+        with session.lock:
+            response = stepping_agents_info(session.store, session.model)
+    elif clock is None:
+        # Without the clock, polling is what drives the simulation
+        with model_lock:
+            response = stepping_agents_info(state_store, model)
+    else:
+        response = None
+    return versioned_agents_info() if response is None else response
+
+
+def stepping_agents_info(store, model):
+    """Steps the model once per poll; None when versioned_agents_info should answer."""
+    # Published before the step, like the original server read the agents before stepping
+    snapshot = store.publish(model, None)
+    etag = f"v{snapshot.version}"
+    if "since" in request.args or "wait" in request.args:
+        model.step()
+        store.publish(model, None)
+        return None
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        model.step()
+        response = Response(snapshot.body, mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+
+def known_version():
+    since = request.args.get("since", type=int)
+    if since is not None:
+        return since
+    for etag in request.if_none_match.as_set():
+        if etag.startswith("v") and etag[1:].isdigit():
+            return int(etag[1:])
+    return None
+
+
+def versioned_agents_info():
+    session = current_session()
+    store = state_store if session is None else session.store
+    snapshot = store.current
+    known = known_version()
+    wait = min(request.args.get("wait", 0, type=float), 60)
+    if known is not None and wait > 0 and snapshot.version <= known:
+        snapshot = store.wait_newer(known, wait)
+
+    etag = f"v{snapshot.version}"
+    if "since" not in request.args and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    body = snapshot.body
+    since = request.args.get("since", type=int)
+    if since is not None:
+        delta = store.delta(since, snapshot)
+        # A version that fell out of history gets the full state instead
+        if delta is not None:
+            body = json.dumps(delta)
+
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+
 @app.route("/drone_info", methods=["GET"])
 def get_drone_info():
-    drone = model.drone[0]
-    return jsonify(
-        {
-            "current_position": drone.pos,
-            "detection": drone.detection,
-            "panoramic": drone.panoramic,
-            "time_counter": drone.time_counter,
-            "drone_override": model.guard[0].drone_override,
-        }
-    )
+    with current_lock():
+        model = current_model()
+        drone = model.drone[0]
+        return jsonify(
+            {
+                "current_position": drone.pos,
+                "detection": drone.detection,
+                "panoramic": drone.panoramic,
+                "time_counter": drone.time_counter,
+                "drone_override": model.guard[0].drone_override,
+            }
+        )
 
 
 @app.route("/guard_info", methods=["GET"])
 def get_guard_info():
-    guard = model.guard[0]
+    with current_lock():
+        guard = current_model().guard[0]
+        return jsonify(
+            {
+                "drone_override": guard.drone_override,
+                "initialize_panoramic_view": guard.initialize_panoramic_view,
+                "drone_override_timer": guard.drone_override_timer,
+            }
+        )
+
+
+@app.route("/drone/trajectory", methods=["GET"])
+def drone_trajectory():
+    start = request.args.get("start", type=int)
+    end = request.args.get("end", type=int)
+    every = request.args.get("every", 1, type=int)
+    max_points = request.args.get("max_points", type=int)
+    if every < 1 or (max_points is not None and max_points < 1):
+        return jsonify({"error": "'every' and 'max_points' must be positive"}), 400
+    drone = request.args.get("drone", 0, type=int)
+    with current_lock():
+        drones = current_model().drone
+        if not 0 <= drone < len(drones):
+            return jsonify({"error": f"'drone' must be between 0 and {len(drones) - 1}"}), 400
+
+        trajectory = drones.trajectory
+        rows = trajectory.query(start, end, every=every, max_points=max_points)
+        # The fleet stores x, y, z of every drone in each row
+        rows = rows[:, [0, 1 + 3 * drone, 2 + 3 * drone, 3 + 3 * drone]]
+        stored, oldest_tick = len(trajectory), trajectory.oldest_tick()
     return jsonify(
         {
-            "drone_override": guard.drone_override,
-            "initialize_panoramic_view": guard.initialize_panoramic_view,
-            "drone_override_timer": guard.drone_override_timer,
+            "stored": stored,
+            "oldest_tick": oldest_tick,
+            "points": [[int(tick), x, y, z] for tick, x, y, z in rows.tolist()],
         }
     )
 
 
+@app.route("/cameras/geometry", methods=["GET"])
+def camera_geometry():
+    with current_lock():
+        model = current_model()
+        return jsonify(
+            {
+                **model.geometry.info(),
+                "alert_camera": model.alert_camera,
+                "override_target": model.override_target(),
+            }
+        )
+
+
+@app.route("/cameras/coverage", methods=["GET"])
+def camera_coverage():
+    with current_lock():
+        model = current_model()
+        point = list(model.drone[0].pos)
+        for axis, name in enumerate("xyz"):
+            value = request.args.get(name, type=float)
+            if value is not None:
+                point[axis] = value
+        nearest, distance = model.geometry.nearest(point)
+        return jsonify(
+            {
+                "point": point,
+                "cameras": model.geometry.cameras_seeing(point),
+                "nearest": {"id": nearest, "distance": distance},
+            }
+        )
+
+
 @app.route("/trigger_panoramic", methods=["GET"])
 def trigger_panoramic():
-    guard = model.guard[0]
-    guard.panoramic_analysis()
+    record_input(current_model(), "trigger_panoramic", {})
     return jsonify({"message": "Panoramic analysis triggered"})
 
 
 @app.route("/simulate_steps", methods=["POST"])
 def simulate_steps():
     steps = request.json.get("steps", 1)
-    for _ in range(steps):
-        model.step()
-    return jsonify({"message": f"Simulated {steps} steps"})
+    skipped = step_model(steps)
+    return jsonify({"message": f"Simulated {steps} steps", "skipped": skipped})
 
 
 @app.route("/reset_simulation", methods=["GET"])
 def reset_simulation():
     global model
-    model = SecurityModel()
+    session = current_session()
+    if session is not None:
+        # Only this session starts over
+        sessions.reset(session.id)
+        with session.lock:
+            session.store.publish(session.model, None)
+        return jsonify({"message": "Simulation reset", "session": session.id})
+    with model_lock:
+        model = new_model()
+        attach_model(model)
+        if event_log is not None:
+            event_log.attach(model)
+        if clock is None:
+            state_store.publish(model, None)
+    if clock is not None:
+        clock.refresh()
     return jsonify({"message": "Simulation reset"})
 
 
+@app.route("/event_log", methods=["GET"])
+def event_log_info():
+    if event_log is None:
+        return jsonify({"error": "Event log is disabled, set EVENT_LOG"}), 404
+    return jsonify(event_log.info())
+
+
+@app.route("/sessions", methods=["GET"])
+def sessions_info():
+    sessions.evict_idle()
+    return jsonify(sessions.info())
+
+
+@app.route("/sessions/<session_id>", methods=["DELETE"])
+def delete_session(session_id):
+    if not sessions.delete(session_id):
+        return jsonify({"error": "Unknown session"}), 404
+    return jsonify({"message": "Session deleted", "session": session_id})
+
+
+def checkpoint_store():
+    global checkpoints
+    if checkpoints is None:
+        from checkpoint import CheckpointStore
+
+        checkpoints = CheckpointStore(
+            os.getenv("CHECKPOINT_DIR") or None, max_entries=int(os.getenv("CHECKPOINT_MAX_ENTRIES", 64))
+        )
+    return checkpoints
+
+
+@app.route("/checkpoints", methods=["GET"])
+def checkpoints_info():
+    return jsonify(checkpoint_store().list())
+
+
+@app.route("/checkpoints", methods=["POST"])
+def create_checkpoint():
+    from checkpoint import NAME, capture
+
+    name = (request.get_json(silent=True) or {}).get("name") or uuid.uuid4().hex[:12]
+    if not NAME.match(name):
+        return jsonify({"error": "Invalid checkpoint name"}), 400
+    start = time.perf_counter()
+    with current_lock():
+        state = capture(current_model())
+    entry = checkpoint_store().save(name, state)
+    return jsonify({**entry, "ms": (time.perf_counter() - start) * 1000}), 201
+
+
+@app.route("/checkpoints/<name>", methods=["DELETE"])
+def delete_checkpoint(name):
+    if not checkpoint_store().delete(name):
+        return jsonify({"error": "Unknown checkpoint"}), 404
+    return jsonify({"message": "Checkpoint deleted", "name": name})
+
+
+@app.route("/checkpoints/<name>/restore", methods=["POST"])
+def restore_checkpoint(name):
+    from checkpoint import NAME, restore
+
+    state = checkpoint_store().load(name) if NAME.match(name) else None
+    if state is None:
+        return jsonify({"error": "Unknown checkpoint"}), 404
+    session = current_session()
+    start = time.perf_counter()
+    try:
+        if session is not None:
+            with session.lock:
+                restore(session.model, state)
+                session.store.publish(session.model, None)
+        else:
+            with model_lock:
+                restore(model, state)
+                # Replay must not run the steps before the restore into it
+                if event_log is not None:
+                    event_log.attach(model)
+                if clock is None:
+                    state_store.publish(model, None)
+            if clock is not None:
+                clock.refresh()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    reply = {"message": "Checkpoint restored", "name": name, "ms": (time.perf_counter() - start) * 1000}
+    if session is not None:
+        reply["session"] = session.id
+    return jsonify(reply)
+
+
+def attach_model(new_model):
+    # Forward every bus message to streaming clients
+    bus = getattr(new_model, "bus", None)
+    if bus is not None:
+        bus.on_publish = stream_hub.publish_event
+
+
+@app.route("/stream")
+def stream():
+    try:
+        filters = parse_filters(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid stream filters"}), 400
+    client = stream_hub.connect(filters)
+    return Response(
+        sse_stream(stream_hub, client),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route("/stream/ws")
+    def stream_ws(ws):
+        try:
+            filters = parse_filters(request.args)
+        except ValueError:
+            filters = parse_filters({})
+        websocket_stream(stream_hub, stream_hub.connect(filters), ws)
+
+else:
+
+    @app.route("/stream/ws")
+    def stream_ws():
+        return jsonify({"error": "WebSocket streaming needs flask-sock installed"}), 501
+
+
+@app.route("/stream/info")
+def stream_info():
+    return jsonify(stream_hub.info())
+
+
+@app.route("/sweep", methods=["POST"])
+def sweep():
+    from sweep import count_runs, run_sweep
+
+    grid = request.json.get("grid")
+    if not isinstance(grid, dict) or not grid:
+        return jsonify({"error": "Missing 'grid' object of parameter -> values"}), 400
+    iterations = request.json.get("iterations", 1)
+    runs = count_runs(grid, iterations)
+    max_runs = int(os.getenv("SWEEP_MAX_RUNS", 200))
+    if runs > max_runs:
+        return jsonify({"error": f"Sweep has {runs} runs, limit is {max_runs}"}), 400
+
+    table = run_sweep(
+        grid,
+        events=request.json.get("events"),
+        steps=request.json.get("steps", 300),
+        iterations=iterations,
+        n_jobs=int(os.getenv("SWEEP_JOBS", -1)),
+    )
+    table = table.reset_index().astype(object)
+    rows = table.where(table.notna(), None).to_dict(orient="records")
+    return jsonify({"runs": runs, "results": rows})
+
+
+def require_clock():
+    if clock is None:
+        return jsonify({"error": "Simulation clock is disabled, set SIM_CLOCK_HZ"}), 404
+
+
+@app.route("/clock", methods=["GET"])
+def clock_info():
+    return require_clock() or jsonify(clock.info())
+
+
+@app.route("/clock/pause", methods=["POST"])
+def clock_pause():
+    if clock is None:
+        return require_clock()
+    clock.pause()
+    return jsonify(clock.info())
+
+
+@app.route("/clock/resume", methods=["POST"])
+def clock_resume():
+    if clock is None:
+        return require_clock()
+    clock.resume()
+    return jsonify(clock.info())
+
+
+@app.route("/clock/speed", methods=["POST"])
+def clock_speed():
+    if clock is None:
+        return require_clock()
+    multiplier = request.json.get("multiplier")
+    if not isinstance(multiplier, (int, float)) or multiplier <= 0:
+        return jsonify({"error": "'multiplier' must be a positive number"}), 400
+    clock.set_speed(multiplier)
+    return jsonify(clock.info())
+
+
+# Views a reader worker answers from shared memory, forwards to the owner,
+# or runs itself (vision calls parallelise across workers that way)
+SHARED_READ_VIEWS = {"agents_info", "get_drone_info", "get_guard_info", "channel"}
+FORWARDED_VIEWS = {
+    "set_channel",
+    "clean_channel",
+    "vision_result",
+    "sessions_info",
+    "delete_session",
+    "checkpoints_info",
+    "create_checkpoint",
+    "delete_checkpoint",
+    "restore_checkpoint",
+    "camera_geometry",
+    "camera_coverage",
+}
+# Shared by every session: the registry itself and process-wide state
+GLOBAL_VIEWS = {
+    "home",
+    "metrics_endpoint",
+    "sessions_info",
+    "delete_session",
+    "event_log_info",
+    "checkpoints_info",
+    "delete_checkpoint",
+    "vision_job",
+    "vision_job_wait",
+    "vision_cache_info",
+    "vision_batch_info",
+    "vision_prefilter_info",
+    "vision_preprocess_info",
+    "vision_motion_info",
+    "vision_scheduler_info",
+    "stream",
+    "stream_ws",
+    "stream_info",
+    "clock_info",
+    "clock_pause",
+    "clock_resume",
+    "clock_speed",
+    "sweep",
+}
+LOCAL_VIEWS = {
+    "home",
+    "vision",
+    "visionFinal",
+    "vision_frame",
+    "vision_final_frame",
+    "vision_cache_info",
+    "vision_batch_info",
+    "vision_prefilter_info",
+    "vision_preprocess_info",
+    "vision_motion_info",
+    "vision_scheduler_info",
+    "metrics_endpoint",
+}
+
+
+@app.before_request
+def reader_dispatch():
+    if SERVER_ROLE != "reader":
+        return None
+    session_id = g.get("session_id")
+    # Shared memory only mirrors the global model; session reads go to the owner
+    if request.endpoint in SHARED_READ_VIEWS and session_id is None:
+        return shared_read(request.endpoint)
+    if request.endpoint in FORWARDED_VIEWS or (
+        session_id is not None and request.endpoint not in LOCAL_VIEWS
+    ):
+        reply = command_client.send(
+            {
+                "method": request.method,
+                "path": request.full_path,
+                "json": request.get_json(silent=True),
+                "session": session_id,
+            }
+        )
+        return Response(reply["body"], status=reply["status"], mimetype=reply["mimetype"])
+    if request.endpoint in LOCAL_VIEWS:
+        return None
+    return jsonify({"error": "Not available on reader workers"}), 404
+
+
+def shared_read(endpoint):
+    global shared_reader
+    if shared_reader is None:
+        try:
+            shared_reader = SharedStateReader(SnapshotSegment(SHM_NAME))
+        except FileNotFoundError:
+            return jsonify({"error": "Simulation owner is not running"}), 503
+    version, body, state = shared_reader.current()
+    if state is None:
+        return jsonify({"error": "No snapshot published yet"}), 503
+
+    if endpoint == "agents_info":
+        known = known_version()
+        wait = min(request.args.get("wait", 0, type=float), 60)
+        if known is not None and wait > 0 and version <= known:
+            version, body, state = shared_reader.wait_newer(known, wait)
+
+        etag = f"v{version}"
+        if "since" not in request.args and request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            since = request.args.get("since", type=int)
+            delta = shared_reader.delta(since, version, state) if since is not None else None
+            # A version this worker never read gets the full state instead
+            response = Response(body if delta is None else json.dumps(delta), mimetype="application/json")
+        response.set_etag(etag)
+        return response
+    if endpoint == "get_drone_info":
+        drone = state["drone"]
+        return jsonify(
+            {
+                "current_position": drone["position"],
+                "detection": drone["detection"],
+                "panoramic": drone["panoramic"],
+                "time_counter": drone["time_counter"],
+                "drone_override": state["guard"]["drone_override"],
+            }
+        )
+    if endpoint == "get_guard_info":
+        guard = state["guard"]
+        return jsonify(
+            {
+                "drone_override": guard["drone_override"],
+                "initialize_panoramic_view": guard["initialize_panoramic_view"],
+                "drone_override_timer": guard["drone_override_timer"],
+            }
+        )
+    return jsonify(state["channel"])
+
+
+def run_command(command):
+    # Replays a request forwarded by a reader worker against this process
+    session_id = command.get("session")
+    with app.test_request_context(
+        command["path"],
+        method=command["method"],
+        json=command["json"],
+        headers={"X-Session-Id": session_id} if session_id else None,
+    ):
+        response = app.full_dispatch_request()
+    return {
+        "status": response.status_code,
+        "body": response.get_data(),
+        "mimetype": response.mimetype,
+    }
+
+
+def start_owner():
+    segment = SnapshotSegment(
+        SHM_NAME, size=int(os.getenv("SHM_SIZE", 4 * 1024 * 1024)), create=True
+    )
+    state_store.listeners.append(lambda snapshot: segment.write(snapshot.version, snapshot.body))
+    if os.path.exists(COMMAND_ADDRESS):
+        os.unlink(COMMAND_ADDRESS)
+    CommandServer(COMMAND_ADDRESS, COMMAND_AUTHKEY, run_command).start()
+    atexit.register(segment.close)
+    return segment
+
+
 if __name__ == "__main__":
-    parameters = {}  # Define any parameters needed for the model
-    model = SecurityModel(parameters)
-    model.setup()
-    app.run(debug=True, host="0.0.0.0", port=8585)
+    model = new_model()
+    attach_model(model)
+    if os.getenv("EVENT_LOG"):
+        from eventlog import EventLog
+
+        event_log = EventLog(os.getenv("EVENT_LOG"), keyframe_every=int(os.getenv("EVENT_LOG_KEYFRAME_EVERY", 100)))
+        event_log.attach(model)
+        atexit.register(event_log.close)
+    if SERVER_ROLE == "owner":
+        start_owner()
+    # Reader workers never step the model, so the owner always runs the clock
+    clock_hz = float(os.getenv("SIM_CLOCK_HZ", 10 if SERVER_ROLE == "owner" else 0))
+    if clock_hz > 0:
+        clock = SimulationClock(lambda: model, model_lock, state_store, hz=clock_hz).start()
+    else:
+        state_store.publish(model, None)
+    print(
+        f"[boot] role={SERVER_ROLE} imports {IMPORT_SECONDS:.2f}s, "
+        f"ready {time.perf_counter() - BOOT_STARTED:.2f}s, "
+        f"peak RSS {max_rss_bytes() / 2**20:.0f} MB, {len(sys.modules)} modules",
+        flush=True,
+    )
+    # The reloader would run a second owner in its parent process
+    app.run(debug=True, host="0.0.0.0", port=int(os.getenv("PORT", 8585)), use_reloader=SERVER_ROLE != "owner")
@@ -0,0 +1,167 @@
+import os
+import pickle
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from clock import StateStore
+
+SESSION_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class Session:
+    def __init__(self, session_id, model):
+        self.id = session_id
+        self.model = model
+        self.lock = threading.RLock()
+        self.store = StateStore()
+        self.created = time.time()
+        self.last_used = time.monotonic()
+        self.active = 0  # requests currently using this session
+
+
+class SessionRegistry:
+    """Simulation sessions keyed by id, created lazily.
+
+    At most `max_live` models stay in memory. Past that, the least recently
+    used idle session is pickled (in memory, or to `snapshot_dir`) and dropped;
+    its next request restores it from the snapshot instead of starting over.
+    Sessions idle for longer than `idle_timeout` seconds are evicted the same way.
+    """
+
+    def __init__(self, factory, max_live=16, idle_timeout=0, snapshot_dir=None):
+        self.factory = factory
+        self.max_live = max_live
+        self.idle_timeout = idle_timeout
+        self.snapshot_dir = snapshot_dir
+        self.live = OrderedDict()
+        self.snapshots = {}
+        self.lock = threading.Lock()
+        self.created = self.restored = self.evicted = 0
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+
+    def acquire(self, session_id):
+        """Live session for `session_id`, marked in use until release()."""
+        with self.lock:
+            session = self.live.get(session_id)
+            if session is None:
+                model = self._restore(session_id)
+                if model is None:
+                    model = self.factory()
+                    self.created += 1
+                else:
+                    self.restored += 1
+                session = self.live[session_id] = Session(session_id, model)
+            self.live.move_to_end(session_id)
+            session.active += 1
+            session.last_used = time.monotonic()
+            self._evict()
+            return session
+
+    def release(self, session):
+        with self.lock:
+            session.active -= 1
+            session.last_used = time.monotonic()
+
+    def reset(self, session_id):
+        with self.lock:
+            self._drop_snapshot(session_id)
+            session = self.live.get(session_id)
+            if session is not None:
+                with session.lock:
+                    session.model = self.factory()
+
+    def delete(self, session_id):
+        with self.lock:
+            found = self.live.pop(session_id, None) is not None
+            return self._drop_snapshot(session_id) or found
+
+    def evict_idle(self):
+        with self.lock:
+            self._evict()
+
+    def _evict(self):
+        now = time.monotonic()
+        for session in list(self.live.values()):
+            if session.active:
+                continue
+            over_cap = len(self.live) > self.max_live
+            idle = self.idle_timeout and now - session.last_used > self.idle_timeout
+            if not over_cap and not idle:
+                continue
+            with session.lock:
+                self._save(session.id, session.model)
+            del self.live[session.id]
+            self.evicted += 1
+
+    def _path(self, session_id):
+        return os.path.join(self.snapshot_dir, f"{session_id}.snapshot")
+
+    def _save(self, session_id, model):
+        data = zlib.compress(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        if self.snapshot_dir:
+            with open(self._path(session_id), "wb") as f:
+                f.write(data)
+            self.snapshots[session_id] = len(data)
+        else:
+            self.snapshots[session_id] = data
+
+    def _restore(self, session_id):
+        data = self.snapshots.pop(session_id, None)
+        if data is None:
+            return None
+        if self.snapshot_dir:
+            path = self._path(session_id)
+            with open(path, "rb") as f:
+                data = f.read()
+            os.remove(path)
+        return pickle.loads(zlib.decompress(data))
+
+    def _drop_snapshot(self, session_id):
+        data = self.snapshots.pop(session_id, None)
+        if data is not None and self.snapshot_dir:
+            os.remove(self._path(session_id))
+        return data is not None
+
+    def info(self):
+        with self.lock:
+            now = time.monotonic()
+            snapshot_bytes = sum(v if isinstance(v, int) else len(v) for v in self.snapshots.values())
+            return {
+                "max_live": self.max_live,
+                "idle_timeout": self.idle_timeout,
+                "live": [
+                    {
+                        "id": session.id,
+                        "tick": session.model.drone.time_counter,
+                        "idle_seconds": round(now - session.last_used, 3),
+                        "active_requests": session.active,
+                    }
+                    for session in self.live.values()
+                ],
+                "snapshotted": sorted(self.snapshots),
+                "snapshot_bytes": snapshot_bytes,
+                "created": self.created,
+                "restored": self.restored,
+                "evicted": self.evicted,
+            }
+
+
+class SessionPrefix:
+    """WSGI middleware mapping /s/<session>/<path> to /<path> with an X-Session-Id header."""
+
+    def __init__(self, app, prefix="/s/"):
+        self.app = app
+        self.prefix = prefix
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path.startswith(self.prefix):
+            session_id, _, rest = path[len(self.prefix) :].partition("/")
+            environ["HTTP_X_SESSION_ID"] = session_id
+            environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + self.prefix + session_id
+            environ["PATH_INFO"] = "/" + rest
+        return self.app(environ, start_response)
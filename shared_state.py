@@ -0,0 +1,184 @@
+import json
+import struct
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Listener
+
+from clock import state_delta
+
+# seq (odd while writing), version, body length
+HEADER = struct.Struct("<QQQ")
+
+
+def attach_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers attached segments with the resource tracker,
+        # which would unlink the owner's segment when a reader exits
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SnapshotSegment:
+    """One state snapshot in shared memory, guarded by a sequence lock.
+
+    The owner writes; readers copy the body and retry if a write overlapped.
+    """
+
+    def __init__(self, name, size=4 * 1024 * 1024, create=False):
+        self.name = name
+        self.owner = create
+        if create:
+            try:
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            HEADER.pack_into(self.shm.buf, 0, 0, 0, 0)
+        else:
+            self.shm = attach_shared_memory(name)
+        self.capacity = self.shm.size - HEADER.size
+
+    def write(self, version, body):
+        if len(body) > self.capacity:
+            raise ValueError(f"Snapshot of {len(body)} bytes exceeds shared segment capacity {self.capacity}")
+        buf = self.shm.buf
+        seq = HEADER.unpack_from(buf, 0)[0]
+        HEADER.pack_into(buf, 0, seq + 1, version, len(body))
+        buf[HEADER.size : HEADER.size + len(body)] = body
+        HEADER.pack_into(buf, 0, seq + 2, version, len(body))
+
+    def version(self):
+        return HEADER.unpack_from(self.shm.buf, 0)[1]
+
+    def read(self, retries=100):
+        buf = self.shm.buf
+        for _ in range(retries):
+            seq, version, length = HEADER.unpack_from(buf, 0)
+            if seq % 2:
+                time.sleep(0)
+                continue
+            body = bytes(buf[HEADER.size : HEADER.size + length])
+            if HEADER.unpack_from(buf, 0)[0] == seq:
+                return version, body
+        raise TimeoutError("Shared snapshot kept changing while being read")
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedStateReader:
+    """Per-worker view of the owner's snapshot, parsed once per version.
+
+    The states of the versions this worker has seen back `since=` deltas,
+    like StateStore's history does in the owner.
+    """
+
+    def __init__(self, segment, history=64, poll_interval=0.01):
+        self.segment = segment
+        self.version = None
+        self.body = None
+        self.state = None
+        self.history = OrderedDict()
+        self.history_size = history
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+
+    def current(self):
+        with self.lock:
+            if self.segment.version() != self.version:
+                self.version, self.body = self.segment.read()
+                self.state = json.loads(self.body) if self.body else None
+                if self.state is not None:
+                    self.history[self.version] = self.state
+                    while len(self.history) > self.history_size:
+                        self.history.popitem(last=False)
+            return self.version, self.body, self.state
+
+    def wait_newer(self, version, timeout):
+        # The owner can't signal other processes, so long-polls check the header
+        deadline = time.monotonic() + timeout
+        while self.segment.version() <= version and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+        return self.current()
+
+    def delta(self, since, version, state):
+        """Changes from version `since` to `state`, or None if this worker never saw `since`."""
+        with self.lock:
+            old = self.history.get(since)
+        if old is None:
+            return None
+        return {"version": version, "since": since, "changes": state_delta(old, state)}
+
+
+class CommandServer:
+    """Owner side of the command queue: runs forwarded commands one at a time."""
+
+    def __init__(self, address, authkey, handler):
+        self.listener = Listener(address, authkey=authkey)
+        self.handler = handler
+        self.queue_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._accept, name="command-server", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except Exception:
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    command = conn.recv()
+                except (EOFError, OSError):
+                    return
+                # Commands from every worker apply in arrival order
+                with self.queue_lock:
+                    try:
+                        reply = self.handler(command)
+                    except Exception as e:
+                        reply = {
+                            "status": 500,
+                            "body": json.dumps({"error": str(e)}).encode(),
+                            "mimetype": "application/json",
+                        }
+                conn.send(reply)
+
+
+class CommandClient:
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def send(self, command):
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    if self.conn is None:
+                        self.conn = Client(self.address, authkey=self.authkey)
+                    self.conn.send(command)
+                    return self.conn.recv()
+                except (EOFError, OSError):
+                    # Owner restarted; reconnect once
+                    self.conn = None
+                    if attempt:
+                        raise
@@ -0,0 +1,206 @@
+import json
+import threading
+import time
+from collections import deque
+
+AGENT_KEYS = ("channel", "guard", "cameras", "drone", "drones")
+
+
+def parse_filters(args):
+    """Build a stream filter from query args (or a dict sent over a WebSocket).
+
+    include=drone,cameras   which parts of the state to send (default all)
+    cameras=2,3             only these camera ids
+    fields=position,locked  only these agent fields
+    events=vision,Drone     bus subjects to forward (default all, "none" for none)
+    """
+
+    def split(name):
+        value = args.get(name)
+        if value is None:
+            return None
+        if isinstance(value, list):
+            return [str(item) for item in value]
+        return [item for item in value.split(",") if item]
+
+    include = split("include")
+    cameras = split("cameras")
+    events = split("events")
+    fields = split("fields")
+    return {
+        "include": set(include) if include else set(AGENT_KEYS),
+        "cameras": {int(c) for c in cameras} if cameras else None,
+        "fields": set(fields) if fields else None,
+        "events": None if events is None else set(events) - {"none"},
+    }
+
+
+def filter_state(state, filters):
+    fields = filters["fields"]
+
+    def pick(info):
+        return info if fields is None else {k: v for k, v in info.items() if k in fields or k == "id"}
+
+    filtered = {}
+    for key in filters["include"]:
+        if key not in state:
+            continue
+        if key == "cameras":
+            cameras = state["cameras"]
+            if filters["cameras"] is not None:
+                cameras = [c for c in cameras if c["id"] in filters["cameras"]]
+            filtered["cameras"] = [pick(c) for c in cameras]
+        elif key == "drones":
+            filtered["drones"] = [pick(d) for d in state["drones"]]
+        elif key == "channel":
+            filtered["channel"] = state["channel"]
+        else:
+            filtered[key] = pick(state[key])
+    return filtered
+
+
+class StreamClient:
+    """Mailbox for one connected client.
+
+    State updates are coalesced: a slow client only ever has the newest
+    snapshot pending. Bus events queue up to `max_events`, oldest dropped first.
+    """
+
+    def __init__(self, filters, max_events=256):
+        self.filters = filters
+        self.cond = threading.Condition()
+        self.pending_state = None
+        self.events = deque(maxlen=max_events)
+        self.coalesced = 0
+        self.dropped = 0
+        self.last_sent = None
+
+    def offer_state(self, snapshot):
+        with self.cond:
+            if self.pending_state is not None:
+                self.coalesced += 1
+            self.pending_state = snapshot
+            self.cond.notify()
+
+    def offer_event(self, message):
+        wanted = self.filters["events"]
+        if wanted is not None and not wanted.intersection(message["topics"]):
+            return
+        with self.cond:
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            self.events.append(message)
+            self.cond.notify()
+
+    def set_filters(self, filters):
+        with self.cond:
+            self.filters = filters
+            self.last_sent = None
+
+    def next_batch(self, timeout):
+        """Outgoing payloads, or [] after `timeout` seconds with nothing new."""
+        with self.cond:
+            if self.pending_state is None and not self.events:
+                self.cond.wait(timeout)
+            snapshot, self.pending_state = self.pending_state, None
+            events = list(self.events)
+            self.events.clear()
+            dropped, self.dropped = self.dropped, 0
+            filters = self.filters
+
+        batch = [
+            {
+                "type": "event",
+                "seq": message["seq"],
+                "subject": message["subject"],
+                "content": message["content"],
+            }
+            for message in events
+        ]
+        if dropped:
+            batch.append({"type": "dropped", "count": dropped})
+        if snapshot is not None:
+            state = filter_state(snapshot.state, filters)
+            # Skip versions that changed nothing this client asked for
+            if state != self.last_sent:
+                self.last_sent = state
+                batch.append({"type": "state", "version": snapshot.version, "data": state})
+        return batch
+
+
+class StreamHub:
+    def __init__(self):
+        self.clients = set()
+        self.lock = threading.Lock()
+        self.latest = None
+
+    def connect(self, filters):
+        client = StreamClient(filters)
+        with self.lock:
+            self.clients.add(client)
+            latest = self.latest
+        if latest is not None:
+            client.offer_state(latest)
+        return client
+
+    def disconnect(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+    def publish_state(self, snapshot):
+        with self.lock:
+            self.latest = snapshot
+            clients = list(self.clients)
+        for client in clients:
+            client.offer_state(snapshot)
+
+    def publish_event(self, message):
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.offer_event(message)
+
+    def info(self):
+        with self.lock:
+            return {
+                "clients": len(self.clients),
+                "coalesced": sum(client.coalesced for client in self.clients),
+            }
+
+
+def sse_stream(hub, client, heartbeat=15.0):
+    try:
+        last_write = time.monotonic()
+        while True:
+            batch = client.next_batch(heartbeat)
+            if not batch:
+                if time.monotonic() - last_write >= heartbeat:
+                    last_write = time.monotonic()
+                    yield ": keepalive\n\n"
+                continue
+            for payload in batch:
+                lines = f"event: {payload['type']}\n"
+                if payload["type"] == "state":
+                    lines += f"id: {payload['version']}\n"
+                yield lines + f"data: {json.dumps(payload)}\n\n"
+            last_write = time.monotonic()
+    finally:
+        hub.disconnect(client)
+
+
+def websocket_stream(hub, client, ws, heartbeat=15.0):
+    try:
+        while True:
+            # Clients may send {"filters": {...}} to change what they receive
+            incoming = ws.receive(timeout=0)
+            if incoming:
+                try:
+                    client.set_filters(parse_filters(json.loads(incoming).get("filters", {})))
+                except (ValueError, AttributeError):
+                    ws.send(json.dumps({"type": "error", "error": "Invalid filters message"}))
+
+            batch = client.next_batch(min(heartbeat, 1.0))
+            for payload in batch:
+                ws.send(json.dumps(payload))
+    finally:
+        hub.disconnect(client)
@@ -0,0 +1,138 @@
+"""Headless parameter sweeps over SecurityModel.
+
+Runs every combination of a parameter grid against the same scripted intrusion
+events on a process pool (agentpy Experiment) and returns one row per run.
+
+    python sweep.py --grid '{"personal_time": [20, 30], "alarm_threshold": [2, 3]}' \\
+        --events events.json --steps 300 --jobs 4 --out sweep.csv
+"""
+import argparse
+import json
+import math
+
+import agentpy as ap
+
+from agents import CameraView, SecurityModel
+
+# A camera sees the intruder for a while, then the drone confirms it
+DEFAULT_EVENTS = [
+    {"tick": 5, "camera": 0, "detection": "YES"},
+    {"tick": 40, "subject": ["Drone"], "content": "intruder"},
+]
+
+
+class ScenarioModel(SecurityModel):
+    """SecurityModel that replays scripted events and reports response metrics.
+
+    Events are dicts with a `tick` and either `camera` + `detection` (sets that
+    camera's detection) or `subject` + `content` (published on the channel).
+    """
+
+    def setup(self):
+        super().setup()
+        events = self.p.get("events", DEFAULT_EVENTS)
+        if isinstance(events, str):
+            # Passed as JSON so agentpy can keep it in its (hashed) parameter table
+            events = json.loads(events)
+        self.events = sorted(events, key=lambda e: e["tick"])
+        self.next_event = 0
+        self.ticks_to_call_cops = math.nan
+        self.first_panoramic = math.nan
+        self.override_ticks = 0
+        self.longest_override = 0
+        self.current_override = 0
+        self.max_alarm_count = 0
+
+    def apply_events(self):
+        while self.next_event < len(self.events) and self.events[self.next_event]["tick"] <= self.t:
+            event = self.events[self.next_event]
+            self.next_event += 1
+            if "camera" in event:
+                camera = self.cameras[event["camera"]]
+                if isinstance(camera, CameraView):
+                    camera.update_vision_result(event["detection"])
+                else:
+                    camera.detection = event["detection"]
+            else:
+                self.channel = {"subject": event["subject"], "content": event["content"]}
+
+    def step(self):
+        self.apply_events()
+        super().step()
+
+        guard = self.guard[0]
+        if guard.call_cops and math.isnan(self.ticks_to_call_cops):
+            self.ticks_to_call_cops = self.t
+        if guard.initialize_panoramic_view and math.isnan(self.first_panoramic):
+            self.first_panoramic = self.t
+        self.max_alarm_count = max(self.max_alarm_count, guard.alarm_count_begin)
+
+        if not self.drone.patrolling():
+            self.override_ticks += 1
+            self.current_override += 1
+            self.longest_override = max(self.longest_override, self.current_override)
+        else:
+            self.current_override = 0
+
+    def end(self):
+        self.report("ticks_to_call_cops", self.ticks_to_call_cops)
+        self.report("first_panoramic", self.first_panoramic)
+        self.report("override_ticks", self.override_ticks)
+        self.report("longest_override", self.longest_override)
+        self.report("max_alarm_count", self.max_alarm_count)
+
+
+def build_sample(grid, events, steps):
+    parameters = {
+        name: ap.Values(*values) if isinstance(values, list) else values
+        for name, values in grid.items()
+    }
+    parameters["steps"] = steps
+    parameters["events"] = json.dumps(events)
+    return ap.Sample(parameters)
+
+
+def count_runs(grid, iterations=1):
+    runs = iterations
+    for values in grid.values():
+        if isinstance(values, list):
+            runs *= len(values)
+    return runs
+
+
+def run_sweep(grid, events=None, steps=300, iterations=1, n_jobs=1):
+    """Run the grid and return a DataFrame with one row per run (parameters + metrics)."""
+    sample = build_sample(grid, DEFAULT_EVENTS if events is None else events, steps)
+    experiment = ap.Experiment(ScenarioModel, sample, iterations=iterations, record=False)
+    results = experiment.run(n_jobs=n_jobs, display=False)
+    table = results.reporters.drop(columns=["seed"], errors="ignore")
+    sample = results.parameters.get("sample")
+    if sample is not None:
+        # Put the swept parameter values next to the metrics they produced
+        table = sample.join(table)
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a SecurityModel parameter sweep.")
+    parser.add_argument("--grid", required=True, help="JSON object of parameter -> list of values")
+    parser.add_argument("--events", help="JSON file with scripted events (default: built-in scenario)")
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--iterations", type=int, default=1)
+    parser.add_argument("--jobs", type=int, default=-1, help="Worker processes (-1 for all CPUs)")
+    parser.add_argument("--out", help="Write the table to this CSV file instead of stdout")
+    args = parser.parse_args(argv)
+
+    events = None
+    if args.events:
+        with open(args.events) as f:
+            events = json.load(f)
+    table = run_sweep(json.loads(args.grid), events, args.steps, args.iterations, args.jobs)
+    if args.out:
+        table.to_csv(args.out)
+    else:
+        print(table.to_string())
+
+
+if __name__ == "__main__":
+    main()
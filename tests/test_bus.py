@@ -0,0 +1,53 @@
+from bus import MessageBus
+
+
+def contents(messages):
+    return [message["content"] for message in messages]
+
+
+def test_each_subscriber_reads_from_its_own_cursor():
+    bus = MessageBus()
+    early = bus.subscribe(["guard"])
+    bus.publish(["guard"], "first")
+    late = bus.subscribe(["guard"])
+    bus.publish(["guard"], "second")
+    bus.publish(["drone"], "elsewhere")
+
+    assert contents(early.poll()) == ["first", "second"]
+    assert contents(late.poll()) == ["second"]
+    assert early.poll() == [] and late.poll() == []
+
+
+def test_message_to_several_followed_subjects_arrives_once_in_order():
+    bus = MessageBus()
+    inbox = bus.subscribe(["guard", "drone"])
+    bus.publish(["guard", "drone"], "both")
+    bus.publish("drone", "drone only")
+    bus.publish(["guard"], "guard only")
+
+    assert contents(inbox.poll()) == ["both", "drone only", "guard only"]
+
+
+def test_slow_subscriber_counts_dropped_messages():
+    bus = MessageBus(capacity=4)
+    inbox = bus.subscribe(["vision"])
+    for index in range(10):
+        bus.publish(["vision"], index)
+
+    assert contents(inbox.poll()) == [6, 7, 8, 9]
+    assert inbox.dropped == 6
+    messages, dropped, cursor = bus.since("vision", 3)
+    assert (contents(messages), dropped, cursor) == ([6, 7, 8, 9], 3, 10)
+
+
+def test_consume_clears_the_channel_view_only_for_the_latest_message():
+    bus = MessageBus()
+    inbox = bus.subscribe(["guard"])
+    bus.publish(["guard"], "old")
+    bus.publish(["guard"], "new")
+    old, new = inbox.poll()
+
+    bus.consume(old)
+    assert bus.latest == {"subject": ["guard"], "content": "new"}
+    bus.consume(new)
+    assert bus.latest == {"subject": [""], "content": ""}
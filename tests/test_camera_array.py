@@ -0,0 +1,43 @@
+import random
+
+from agents import CameraArray, SecurityModel
+from clock import model_state
+
+
+def make_model(arrays):
+    model = SecurityModel({"cameras": 6, "camera_arrays": arrays})
+    model.setup()
+    return model
+
+
+def test_camera_array_steps_like_camera_agents():
+    rng = random.Random(1)
+    agents, arrays = make_model(False), make_model(True)
+    assert isinstance(arrays.cameras, CameraArray)
+    messages = [
+        lambda: {"subject": ["drone"], "content": "intruder begin"},
+        lambda: {"subject": ["vision_result"], "content": {"id": rng.randrange(7), "result": rng.choice(["YES", "NO", "maybe"])}},
+        lambda: {"subject": [""], "content": ""},
+    ]
+    for tick in range(1000):
+        if rng.random() < 0.05:
+            camera, result = rng.randrange(6), rng.choice(["YES", "NO"])
+            agents.cameras[camera].update_vision_result(result)
+            arrays.cameras[camera].update_vision_result(result)
+        if rng.random() < 0.05:
+            camera = rng.randrange(6)
+            agents.cameras[camera].increase_alert_checks()
+            arrays.cameras[camera].increase_alert_checks()
+        if rng.random() < 0.3:
+            message = rng.choice(messages)()
+            agents.channel = dict(message)
+            arrays.channel = dict(message)
+        agents.step()
+        arrays.step()
+
+        assert model_state(agents) == model_state(arrays), tick
+        assert agents.alert_camera == arrays.alert_camera, tick
+
+    fires = {name: sum(camera.rules.fires[name] for camera in agents.cameras) for name in arrays.cameras.fires}
+    assert fires == arrays.cameras.fires
+    assert fires["lock_in"] > 0 and fires["alert_guard"] > 0
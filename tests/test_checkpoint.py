@@ -0,0 +1,31 @@
+import numpy as np
+
+import checkpoint
+from agents import SecurityModel
+
+
+def make_model():
+    model = SecurityModel({"cameras": 4})
+    model.setup()
+    return model
+
+
+def step(model, steps):
+    for _ in range(steps):
+        model.step()
+
+
+def test_restore_rewinds_trajectory():
+    model = make_model()
+    step(model, 100)
+    state = checkpoint.capture(model)
+    step(model, 100)
+    checkpoint.restore(model, state)
+    step(model, 50)
+
+    trajectory = model.drone.trajectory
+    assert len(trajectory.query(180, 200)) == 0
+    ticks = trajectory.query()[:, 0]
+    assert np.all(np.diff(ticks) > 0)
+    assert len(trajectory.query(101, 150)) == 50
+    assert trajectory.latest()[0, 0] == model.drone.time_counter == 150
@@ -0,0 +1,60 @@
+import eventlog
+from agents import SecurityModel
+
+
+def make_model():
+    model = SecurityModel({"cameras": 4, "drones": 2})
+    model.setup()
+    return model
+
+
+def drone_positions(model):
+    return model.drone.time_counter, model.drone.pos.tolist()
+
+
+def test_state_at_inside_skip(tmp_path):
+    path = str(tmp_path / "events.log")
+    log = eventlog.EventLog(path, keyframe_every=100)
+    model = make_model()
+    log.attach(model)
+    assert model.advance(1000) > 0
+    log.close()
+
+    reference = make_model()
+    expected = {}
+    for _ in range(1000):
+        reference.step()
+        expected[reference.drone.time_counter] = drone_positions(reference)
+
+    reader = eventlog.EventLogReader(path)
+    for tick in (1, 25, 99, 100, 650, 999, 1000):
+        assert drone_positions(reader.state_at(tick)) == expected[tick]
+    assert [tick for tick, _ in reader.replay(640, 650)][-1] == 650
+    reader.close()
+
+
+def test_rejected_input_is_not_logged(tmp_path, monkeypatch):
+    import server
+
+    path = str(tmp_path / "events.log")
+    log = eventlog.EventLog(path, keyframe_every=100)
+    model = server.new_model()
+    monkeypatch.setattr(server, "model", model, raising=False)
+    monkeypatch.setattr(server, "event_log", log)
+    server.attach_model(model)
+    log.attach(model)
+    client = server.app.test_client()
+
+    for agent_id in ("1", 99, -1):
+        response = client.post("/vision_result", json={"agent_type": "camera", "id": agent_id, "result": "YES"})
+        assert response.status_code == 400
+    assert client.post("/vision_result", json={"agent_type": "camera", "id": 2, "result": "YES"}).status_code == 200
+    model.step()
+    log.close()
+
+    reader = eventlog.EventLogReader(path)
+    inputs = [kind for _, kind, _, _ in reader.records() if kind == eventlog.INPUT]
+    assert len(inputs) == 1
+    assert list(reader.replay(verify=True))
+    assert reader.mismatches == []
+    reader.close()
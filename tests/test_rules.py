@@ -0,0 +1,81 @@
+import random
+
+from agents import SecurityModel
+from rules import Rule, RuleEngine
+
+
+class Counter:
+    """Agent with two state fields and rules that read and change them."""
+
+    def __init__(self, memoize):
+        self.level = 0
+        self.armed = False
+        self.log = []
+        reads = (lambda *names: names) if memoize else (lambda *names: ())
+        self.rules = RuleEngine(
+            self,
+            [
+                Rule(self.arm, lambda: self.level >= 3 and not self.armed, reads=reads("level", "armed")),
+                Rule(self.report, lambda: self.armed, reads=reads("armed")),
+                Rule(self.tick),
+            ],
+        )
+
+    def arm(self):
+        self.armed = True
+        self.log.append("arm")
+
+    def report(self):
+        self.log.append(("report", self.level))
+
+    def tick(self):
+        self.log.append("tick")
+
+
+def test_memoized_rules_fire_like_full_evaluation():
+    rng = random.Random(7)
+    memoized, full = Counter(memoize=True), Counter(memoize=False)
+    for _ in range(500):
+        change = rng.random()
+        for agent in (memoized, full):
+            if change < 0.2:
+                agent.level += 1
+            elif change < 0.25:
+                agent.level, agent.armed = 0, False
+            agent.rules.run()
+
+    assert memoized.log == full.log
+    assert memoized.rules.fires == full.rules.fires
+    assert memoized.rules.reused > 0
+    assert full.rules.reused == 0
+    assert memoized.rules.evaluations < full.rules.evaluations
+
+
+def test_model_rule_counters_match_unmemoized_run():
+    def run(memoize):
+        model = SecurityModel({"cameras": 4})
+        model.setup()
+        if not memoize:
+            for agent in [*model.guard, *model.cameras]:
+                for entry in agent.rules.table:
+                    entry[3] = None
+        for tick in range(300):
+            if tick % 50 == 10:
+                model.channel = {"subject": ["drone"], "content": "intruder begin"}
+            if tick == 120:
+                model.cameras[2].update_vision_result("YES")
+            model.step()
+        return (
+            [agent.rules.fires for agent in [*model.guard, *model.cameras]],
+            checkpoint_state(model),
+        )
+
+    assert run(memoize=True) == run(memoize=False)
+
+
+def checkpoint_state(model):
+    import checkpoint
+
+    state = checkpoint.capture(model)
+    state.pop("bus")
+    return state
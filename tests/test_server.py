@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+import server
+from clock import SimulationClock, StateStore
+
+
+@pytest.fixture
+def paused_clock(monkeypatch):
+    model = server.new_model()
+    store = StateStore()
+    monkeypatch.setattr(server, "model", model, raising=False)
+    monkeypatch.setattr(server, "state_store", store)
+    clock = SimulationClock(lambda: server.model, server.model_lock, store, hz=100)
+    clock.pause()
+    monkeypatch.setattr(server, "clock", clock.start())
+    yield clock
+    clock.stop()
+
+
+def test_input_wakes_long_poll_while_paused(paused_clock):
+    client = server.app.test_client()
+    version = client.get("/agents_info").json["version"]
+    replies = []
+    poll = threading.Thread(
+        target=lambda: replies.append(client.get(f"/agents_info?since={version}&wait=5").json)
+    )
+    poll.start()
+    server.app.test_client().post("/set_channel", json={"subject": ["Guard"], "content": "intruder"})
+    poll.join(timeout=5)
+
+    assert not poll.is_alive()
+    assert replies[0]["changes"]["channel"] == {"subject": ["Guard"], "content": "intruder"}
+    assert client.get("/agents_info").json["channel"]["content"] == "intruder"
+
+
+@pytest.fixture
+def polled_model(monkeypatch):
+    model = server.new_model()
+    monkeypatch.setattr(server, "model", model, raising=False)
+    monkeypatch.setattr(server, "state_store", StateStore())
+    monkeypatch.setattr(server, "clock", None)
+    return model
+
+
+def test_polling_serves_the_snapshot_before_its_step(polled_model):
+    client = server.app.test_client()
+    first = client.get("/agents_info")
+    second = client.get("/agents_info", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert polled_model.drone.time_counter == 2
+    assert first.json["drone"]["time_counter"] == 0
+    assert second.status_code == 200
+    assert second.json["drone"]["time_counter"] == 1
+    assert second.headers["ETag"] == f'"v{second.json["version"]}"'
+
+    # Nothing moved since this version was published, so no step either
+    current = f'"v{server.state_store.publish(polled_model, None).version}"'
+    assert client.get("/agents_info", headers={"If-None-Match": current}).status_code == 304
+    assert polled_model.drone.time_counter == 2
@@ -0,0 +1,47 @@
+import json
+import uuid
+
+from shared_state import CommandClient, CommandServer
+
+
+def test_command_error_reply_is_json(tmp_path):
+    def handler(command):
+        raise RuntimeError("boom")
+
+    address = str(tmp_path / "commands.sock")
+    authkey = uuid.uuid4().bytes
+    CommandServer(address, authkey, handler).start()
+    reply = CommandClient(address, authkey).send({"path": "/set_channel"})
+
+    assert reply["status"] == 500
+    assert reply["mimetype"] == "application/json"
+    assert json.loads(reply["body"]) == {"error": "boom"}
+
+
+def test_reader_deltas_and_long_poll():
+    import threading
+
+    from agents import SecurityModel
+    from clock import StateStore
+    from shared_state import SharedStateReader, SnapshotSegment
+
+    model = SecurityModel({"cameras": 4})
+    model.setup()
+    segment = SnapshotSegment(f"test_{uuid.uuid4().hex[:8]}", size=1 << 16, create=True)
+    store = StateStore()
+    store.listeners.append(lambda snapshot: segment.write(snapshot.version, snapshot.body))
+    try:
+        store.publish(model, 0)
+        reader = SharedStateReader(segment)
+        first, _, _ = reader.current()
+
+        model.channel = {"subject": ["Guard"], "content": "intruder"}
+        threading.Timer(0.05, store.publish, (model, 0)).start()
+        version, _, state = reader.wait_newer(first, 5)
+
+        assert version == first + 1
+        delta = reader.delta(first, version, state)
+        assert delta["changes"] == {"channel": {"subject": ["Guard"], "content": "intruder"}}
+        assert reader.delta(first - 1, version, state) is None
+    finally:
+        segment.close()
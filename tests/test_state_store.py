@@ -0,0 +1,55 @@
+import random
+
+from agents import SecurityModel
+from clock import StateStore, apply_delta, model_state, state_delta
+
+
+def make_model(drones=1):
+    model = SecurityModel({"cameras": 4, "drones": drones})
+    model.setup()
+    return model
+
+
+def test_deltas_rebuild_every_state():
+    rng = random.Random(5)
+    model = make_model(drones=3)
+    state = model_state(model)
+    for tick in range(300):
+        if rng.random() < 0.1:
+            model.channel = {"subject": ["drone"], "content": "intruder begin"}
+        if rng.random() < 0.05:
+            model.cameras[rng.randrange(4)].update_vision_result(rng.choice(["YES", "NO"]))
+        model.step()
+        new = model_state(model)
+        assert apply_delta(state, state_delta(state, new)) == new, tick
+        state = new
+
+
+def test_delta_holds_only_changed_fields():
+    model = make_model()
+    old = model_state(model)
+    model.channel = {"subject": ["Guard"], "content": "intruder"}
+    model.cameras[2].increase_alert_checks()
+
+    assert state_delta(old, model_state(model)) == {
+        "channel": {"subject": ["Guard"], "content": "intruder"},
+        "cameras": {"2": {"alert_checks": 1}},
+    }
+
+
+def test_store_versions_and_since():
+    model = make_model()
+    store = StateStore(history=2)
+    first = store.publish(model, 0)
+    assert store.publish(model, 0).version == first.version
+
+    model.step()
+    second = store.publish(model, 1)
+    delta = store.delta(first.version, second)
+    assert delta["version"] == second.version and delta["since"] == first.version
+    assert apply_delta(first.state, delta["changes"]) == second.state
+
+    model.step()
+    store.publish(model, 2)
+    # Out of the two-entry history: callers fall back to the full state
+    assert store.delta(first.version, store.current) is None
@@ -0,0 +1,33 @@
+import os
+
+from util.vision_cache import VisionCache
+
+
+def result(message):
+    return {"message": message, "is_off": False}
+
+
+def test_disk_tier_is_capped_and_cleared(tmp_path):
+    cache = VisionCache(max_entries=2, ttl=60, disk_dir=str(tmp_path), disk_max_entries=3)
+    for index in range(5):
+        cache.put(f"key{index}", result("NO"))
+    assert sorted(os.listdir(tmp_path)) == ["key2.json", "key3.json", "key4.json"]
+
+    # Evicted from memory, still served from disk
+    assert cache.get("key2") == result("NO")
+    assert cache.get("key0") is None
+
+    cache.clear()
+    assert os.listdir(tmp_path) == []
+    assert cache.get("key4") is None
+
+
+def test_expired_files_are_removed(tmp_path):
+    cache = VisionCache(ttl=60, disk_dir=str(tmp_path))
+    cache.put("old", result("YES"))
+    cache.disk_entries["old"] -= 120
+    cache.put("new", result("NO"))
+    assert os.listdir(tmp_path) == ["new.json"]
+
+    # A restarted cache picks up what is on disk
+    assert VisionCache(ttl=60, disk_dir=str(tmp_path)).info()["disk_entries"] == 1
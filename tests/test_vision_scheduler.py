@@ -0,0 +1,73 @@
+import threading
+import time
+
+from util.vision_scheduler import VisionScheduler
+
+
+def hold_slot(scheduler):
+    """Occupies the only in-flight slot until the returned event is set."""
+    release, started = threading.Event(), threading.Event()
+
+    def busy():
+        started.set()
+        release.wait(5)
+        return {"message": "NO"}
+
+    thread = threading.Thread(target=scheduler.run, args=(busy,))
+    thread.start()
+    started.wait(5)
+    return release, thread
+
+
+def test_queued_calls_are_admitted_by_priority_then_arrival():
+    scheduler = VisionScheduler(max_inflight=1)
+    release, holder = hold_slot(scheduler)
+    order = []
+    threads = []
+    for name, priority in [("camera 1", "camera"), ("camera 2", "camera"), ("drone", "drone"), ("final", "drone_final")]:
+        thread = threading.Thread(target=scheduler.run, args=(lambda name=name: order.append(name), priority))
+        thread.start()
+        threads.append(thread)
+        # Arrival order within a class is what the test checks
+        while sum(scheduler.info()["queued"].values()) < len(threads):
+            time.sleep(0.001)
+    release.set()
+    for thread in [holder, *threads]:
+        thread.join(5)
+
+    assert order == ["final", "drone", "camera 1", "camera 2"]
+    assert scheduler.info()["classes"]["camera"]["admitted"] == 3
+
+
+def test_call_still_queued_at_its_deadline_is_dropped():
+    scheduler = VisionScheduler(max_inflight=1)
+    release, holder = hold_slot(scheduler)
+    result = scheduler.run(lambda: {"message": "YES"}, "camera", deadline=0.05)
+    release.set()
+    holder.join(5)
+
+    assert result["dropped"] and result["status"] == 504
+    assert scheduler.info()["classes"]["camera"]["dropped"] == 1
+
+
+def test_token_budget_scales_with_frames_per_call():
+    scheduler = VisionScheduler(tokens_per_minute=6000, tokens_per_frame=1000)
+    now = time.monotonic()
+    assert scheduler._budget_wait(now, 1) == 0
+    assert scheduler._budget_wait(now, 8) == 0
+
+    # One batch of 4 frames used 4000 tokens: the estimate stays at 1000 per frame
+    scheduler.record_tokens(4000, frames=4)
+    assert scheduler.tokens_per_frame == 1000
+    now = time.monotonic()
+    assert scheduler._budget_wait(now, 2) == 0
+    assert scheduler._budget_wait(now, 3) > 0
+
+
+def test_request_bucket_is_charged_once_per_call():
+    scheduler = VisionScheduler(requests_per_minute=2)
+    scheduler.run(lambda: None, frames=8)
+    scheduler.run(lambda: None, frames=8)
+
+    assert scheduler._budget_wait(time.monotonic(), 1) > 0
+    assert scheduler.info()["classes"]["camera"]["admitted"] == 2
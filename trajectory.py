@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+
+
+class Trajectory:
+    """Ring buffer of (tick, x, y, z, ...) rows with range queries by tick.
+
+    Ticks are appended in increasing order, so each of the (at most two)
+    contiguous parts of the ring is sorted and can be binary searched.
+    """
+
+    def __init__(self, capacity=36000, width=3):
+        # width values per row after the tick, e.g. 3 * drones for a fleet
+        self.capacity = capacity
+        self.rows = np.zeros((capacity, 1 + width), dtype=np.float64)
+        self.count = 0  # rows ever appended
+
+    def append(self, tick, pos):
+        row = self.rows[self.count % self.capacity]
+        row[0] = tick
+        row[1:] = pos
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def _segments(self):
+        if self.count <= self.capacity:
+            return [self.rows[: self.count]]
+        head = self.count % self.capacity
+        return [self.rows[head:], self.rows[:head]]
+
+    def latest(self, n=1):
+        n = min(n, len(self))
+        if n == 0:
+            return np.empty((0, self.rows.shape[1]))
+        idx = (np.arange(self.count - n, self.count)) % self.capacity
+        return self.rows[idx]
+
+    def query(self, start=None, end=None, every=1, max_points=None):
+        """Rows with start <= tick <= end, thinned to every Nth and at most max_points."""
+        parts = []
+        for segment in self._segments():
+            ticks = segment[:, 0]
+            lo = 0 if start is None else np.searchsorted(ticks, start, side="left")
+            hi = len(ticks) if end is None else np.searchsorted(ticks, end, side="right")
+            if hi > lo:
+                parts.append(segment[lo:hi])
+        if not parts:
+            return np.empty((0, self.rows.shape[1]))
+        rows = parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+        if every > 1:
+            rows = rows[::every]
+        if max_points and len(rows) > max_points:
+            rows = rows[:: math.ceil(len(rows) / max_points)]
+        return rows
+
+    def truncate(self, tick):
+        """Drops rows after `tick`, e.g. when the model is rewound to it."""
+        kept = np.array(self.query(None, tick))
+        self.rows[: len(kept)] = kept
+        self.count = len(kept)
+
+    def oldest_tick(self):
+        if not len(self):
+            return None
+        return int(self._segments()[0][0, 0])
@@ -1,51 +1,265 @@
+import base64
+import re
+import threading
+import time
 import traceback
 from flask import jsonify
 import os
-import requests
 from dotenv import load_dotenv
 
+from metrics import errors, vision_tokens, vision_upstream_seconds
+from util.frame_preprocess import FramePreprocessor, FrameTooLarge
+from util.motion_gate import MotionGate
+from util.red_prefilter import RedPrefilter
+from util.vision_batch import VisionBatcher
+from util.vision_cache import VisionCache
+from util.vision_scheduler import PRIORITIES, VisionScheduler
+
 load_dotenv()
 
 
 api_key = os.getenv("OPENAI_API_KEY")
-print(api_key)
 headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
+# Point at a local stand-in server for benchmarks and offline runs
+base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+# (connect, read) seconds for upstream calls
+timeout = (float(os.getenv("VISION_CONNECT_TIMEOUT", 5)), float(os.getenv("VISION_READ_TIMEOUT", 60)))
+http = None
+http_lock = threading.Lock()
+
+phash_distance = os.getenv("VISION_CACHE_PHASH_DISTANCE")
+cache = None
+if os.getenv("VISION_CACHE", "1") != "0":
+    cache = VisionCache(
+        max_entries=int(os.getenv("VISION_CACHE_SIZE", 256)),
+        ttl=float(os.getenv("VISION_CACHE_TTL", 30)),
+        phash_distance=int(phash_distance) if phash_distance else None,
+        disk_dir=os.getenv("VISION_CACHE_DIR") or None,
+        disk_max_entries=int(os.getenv("VISION_CACHE_DISK_SIZE", 4096)),
+    )
+
+prefilter = None
+if os.getenv("VISION_PREFILTER", "off") != "off":
+    prefilter = RedPrefilter(
+        mode=os.getenv("VISION_PREFILTER"),
+        min_blob=float(os.getenv("VISION_PREFILTER_MIN_BLOB", 0.002)),
+    )
+
+preprocessor = None
+if os.getenv("VISION_PREPROCESS", "0") != "0":
+    preprocessor = FramePreprocessor(
+        max_dim=int(os.getenv("VISION_MAX_DIM", 768)),
+        quality=int(os.getenv("VISION_JPEG_QUALITY", 80)),
+        red_only_color=os.getenv("VISION_RED_ONLY_COLOR", "0") == "1",
+        max_input_bytes=int(os.getenv("VISION_MAX_INPUT_BYTES", 8 * 1024 * 1024)),
+        control_rate=float(os.getenv("VISION_PREPROCESS_CONTROL", 0)),
+    )
+motion_gate = None
+if os.getenv("VISION_MOTION_GATE", "0") != "0":
+    motion_gate = MotionGate(
+        threshold=float(os.getenv("VISION_MOTION_THRESHOLD", 0.01)),
+        pixel_delta=float(os.getenv("VISION_MOTION_PIXEL_DELTA", 12)),
+        refresh_every=int(os.getenv("VISION_MOTION_REFRESH", 30)),
+    )
+scheduler = None
+if os.getenv("VISION_SCHEDULER", "0") != "0":
+    scheduler = VisionScheduler(
+        requests_per_minute=float(os.getenv("VISION_RPM", 0)),
+        tokens_per_minute=float(os.getenv("VISION_TPM", 0)),
+        max_inflight=int(os.getenv("VISION_MAX_INFLIGHT", 8)),
+        deadline=float(os.getenv("VISION_FRAME_DEADLINE", 10)),
+    )
+# OpenAI image detail: low, high or auto (None leaves it to the API default)
+detail = os.getenv("VISION_DETAIL") or None
+
+batcher = None
+if float(os.getenv("VISION_BATCH_WINDOW", 0)) > 0:
+    batcher = VisionBatcher(
+        lambda images, priorities, deadlines: request_vision_batch(images, *batch_urgency(priorities, deadlines)),
+        window=float(os.getenv("VISION_BATCH_WINDOW")),
+        max_batch=int(os.getenv("VISION_BATCH_MAX", 8)),
+        deadline=float(os.getenv("VISION_BATCH_DEADLINE", 10)),
+    )
+
+
+# Describe how one frame was handled, so they don't carry over to a reused answer
+PER_FRAME_FIELDS = ("preprocess", "prefilter", "cached", "full_response", "batch_size", "motion")
+
+
+def answer_only(result):
+    return {name: value for name, value in result.items() if name not in PER_FRAME_FIELDS}
+
+
+def process_image(image_data: str = "[No Image Data]", camera_id=None, priority="camera", deadline=None):
+    if not image_data or image_data == "[No Image Data]":
+        return {"error": "No image data provided"}
+
+    if preprocessor is not None:
+        # Before anything below decodes the frame
+        try:
+            preprocessor.check_size(image_data)
+        except FrameTooLarge as e:
+            return {"error": str(e), "status": 413}
+
+    if motion_gate is None or camera_id is None:
+        return analyze_frame(image_data, priority, deadline)
 
-def process_image(image_data: str = "[No Image Data]"):
     try:
-        if not image_data or image_data == "[No Image Data]":
-            return {"error": "No image data provided"}
-
-        payload = {
-            "model": "gpt-4o-mini",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "Analyze the image and if you identify a humanoid red figure, return YES, else if there is no humanoid red figure return NO"},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}"}},
-                    ],
-                }
-            ],
-            "max_tokens": 300,
-        }
+        motion, features = motion_gate.check(camera_id, image_data)
+    except Exception as e:
+        return {"error": f"Invalid image data: {e}"}
+    if motion["gated"]:
+        # Static scene: this camera's last answer still holds
+        return {**answer_only(motion.pop("result")), "motion": motion}
+
+    result = analyze_frame(image_data, priority, deadline)
+    if "error" in result:
+        return result
+    motion_gate.record(camera_id, features, answer_only(result))
+    return {**result, "motion": motion}
+
+
+def analyze_frame(image_data, priority="camera", deadline=None):
+    key = phash = None
+    if cache is not None:
+        try:
+            key, phash = cache.keys_for(image_data)
+        except Exception as e:
+            return {"error": f"Invalid image data: {e}"}
+
+        cached = cache.get(key, phash)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+    check = None
+    if prefilter is not None:
+        try:
+            check = prefilter.check(image_data)
+        except Exception as e:
+            return {"error": f"Invalid image data: {e}"}
+        if prefilter.mode == "gate" and not check["passed"]:
+            return {"message": "NO", "is_off": False, "prefilter": check}
+
+    frame, report = image_data, None
+    if preprocessor is not None:
+        try:
+            frame, report = preprocessor.prepare(image_data)
+        except FrameTooLarge as e:
+            return {"error": str(e), "status": 413}
+        except Exception as e:
+            return {"error": f"Invalid image data: {e}"}
+
+    started = time.perf_counter()
+    result = upstream_vision(frame, priority, deadline)
+    if report is not None:
+        preprocessor.record_upstream(report, time.perf_counter() - started)
+    if "error" not in result:
+        if report is not None:
+            result["preprocess"] = report
+        if check is not None:
+            prefilter.record_model(check, result.get("message"))
+            result["prefilter"] = check
+        if cache is not None:
+            cache.put(key, answer_only(result), phash)
+    return result
+
+
+def upstream_vision(image_data, priority="camera", deadline=None):
+    if batcher is not None:
+        return batcher.submit(image_data, priority, deadline)
+    return request_vision(image_data, priority, deadline)
+
+
+def batch_urgency(priorities, deadlines):
+    # A batch goes at its most urgent frame's priority and waits as long as its most patient frame
+    priority = min(priorities, key=lambda name: PRIORITIES.get(name, len(PRIORITIES)))
+    deadline = None if None in deadlines else max(deadlines)
+    return priority, deadline
+
+
+def image_part(image_data):
+    if not isinstance(image_data, str):
+        # Raw JPEG bytes from the binary upload path; encode once, right before sending
+        image_data = base64.b64encode(image_data).decode("ascii")
+    image_url = {"url": f"data:image/jpeg;base64,{image_data}"}
+    if detail:
+        image_url["detail"] = detail
+    return {"type": "image_url", "image_url": image_url}
 
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions", headers=headers, json=payload
+
+def http_session():
+    # One keep-alive connection pool shared by every upstream call
+    global http
+    with http_lock:
+        if http is None:
+            import requests  # deferred: not needed until the first upstream call
+            from requests.adapters import HTTPAdapter
+
+            http = requests.Session()
+            http.headers.update(headers)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv("VISION_HTTP_POOL", 16)))
+            http.mount("https://", adapter)
+            http.mount("http://", adapter)
+        return http
+
+
+def chat_completion(content, max_tokens=300, frames=1, priority="camera", deadline=None):
+    payload = {
+        "model": "gpt-4o-mini",
+        "messages": [{"role": "user", "content": content}],
+        "max_tokens": max_tokens,
+    }
+    if scheduler is None:
+        return post_completion(payload, frames)
+    # Admission is per request, so a batch is charged once for its `frames` images
+    return scheduler.run(lambda: post_completion(payload, frames), priority, deadline, frames)
+
+
+def post_completion(payload, frames):
+    started = time.perf_counter()
+    response = http_session().post(f"{base_url}/chat/completions", json=payload, timeout=timeout)
+    response_json = response.json()
+    vision_upstream_seconds.observe(time.perf_counter() - started, status=response.status_code)
+
+    usage = response_json.get("usage") or {}
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if kind in usage:
+            vision_tokens.inc(usage[kind], type=kind.split("_")[0])
+    if scheduler is not None and usage:
+        scheduler.record_tokens(
+            usage.get("total_tokens") or usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0), frames
         )
-        response_json = response.json()
 
-        if 'error' in response_json:
-            return {
-                "error": "OpenAI API Error",
-                "details": response_json['error']
-            }
+    if 'error' in response_json:
+        error_type = response_json['error'].get("type", "unknown") if isinstance(response_json['error'], dict) else "unknown"
+        errors.inc(where="openai", type=error_type)
+        return {
+            "error": "OpenAI API Error",
+            "details": response_json['error']
+        }
 
-        if 'choices' not in response_json or not response_json['choices']:
-            return {
-                "error": "Unexpected API response",
-                "details": response_json
-            }
+    if 'choices' not in response_json or not response_json['choices']:
+        errors.inc(where="openai", type="unexpected_response")
+        return {
+            "error": "Unexpected API response",
+            "details": response_json
+        }
+
+    return response_json
+
+
+def request_vision(image_data, priority="camera", deadline=None):
+    try:
+        response_json = chat_completion(
+            [
+                {"type": "text", "text": "Analyze the image and if you identify a humanoid red figure, return YES, else if there is no humanoid red figure return NO"},
+                image_part(image_data),
+            ],
+            priority=priority,
+            deadline=deadline,
+        )
+        if "error" in response_json:
+            return response_json
 
         message = response_json["choices"][0]["message"]["content"]
 
@@ -55,4 +269,49 @@ def process_image(image_data: str = "[No Image Data]"):
         return {"message": message, "is_off": is_off, "full_response": response_json}
 
     except Exception as e:
+        errors.inc(where="vision", type=type(e).__name__)
         return {"error": str(e), "traceback": traceback.format_exc()}
+
+
+def request_vision_batch(images, priority="camera", deadline=None):
+    # One multi-image request; answers come back as "<n>: YES|NO" lines
+    if len(images) == 1:
+        return [request_vision(images[0], priority, deadline)]
+
+    try:
+        content = [
+            {
+                "type": "text",
+                "text": (
+                    f"You will receive {len(images)} images numbered 1 to {len(images)}. "
+                    "For each image, answer YES if you identify a humanoid red figure, else NO. "
+                    f"Reply with exactly {len(images)} lines in the form '<number>: YES' or '<number>: NO'."
+                ),
+            }
+        ]
+        for index, image_data in enumerate(images, start=1):
+            content.append({"type": "text", "text": f"Image {index}:"})
+            content.append(image_part(image_data))
+
+        response_json = chat_completion(
+            content, max_tokens=16 * len(images) + 32, frames=len(images), priority=priority, deadline=deadline
+        )
+        if "error" in response_json:
+            return [response_json] * len(images)
+        message = response_json["choices"][0]["message"]["content"]
+    except Exception as e:
+        errors.inc(where="vision", type=type(e).__name__)
+        return [{"error": str(e), "traceback": traceback.format_exc()}] * len(images)
+
+    answers = {}
+    for match in re.finditer(r"(\d+)\s*[:.)-]\s*\**\s*(YES|NO)\b", message, re.IGNORECASE):
+        answers.setdefault(int(match.group(1)), match.group(2).upper())
+
+    results = []
+    for index, image_data in enumerate(images, start=1):
+        if index in answers:
+            results.append({"message": answers[index], "is_off": False, "batch_size": len(images)})
+        else:
+            # The model skipped this frame; ask about it on its own
+            results.append(request_vision(image_data, priority, deadline))
+    return results
@@ -0,0 +1,147 @@
+import io
+import random
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from util.red_prefilter import red_mask
+from util.vision_cache import frame_bytes
+
+
+class FrameTooLarge(ValueError):
+    pass
+
+
+def decoded_size(image_data):
+    """Size in bytes of a frame, without base64-decoding it."""
+    if isinstance(image_data, str):
+        return len(image_data) * 3 // 4 - image_data[-2:].count("=")
+    return len(image_data)
+
+
+def keep_red(image):
+    # Grayscale everywhere except red pixels; flat chroma compresses much better
+    pixels = np.asarray(image, dtype=np.int16)
+    gray = np.asarray(image.convert("L"))
+    out = np.repeat(gray[..., None], 3, axis=2)
+    mask = red_mask(pixels)
+    out[mask] = pixels[mask]
+    return Image.fromarray(out)
+
+
+class FramePreprocessor:
+    """Downscales and recompresses frames before they go upstream.
+
+    With `control_rate` > 0 that fraction of frames is sent untouched, so the
+    upstream latency of processed and original frames can be compared.
+    """
+
+    def __init__(
+        self,
+        max_dim=768,
+        quality=80,
+        red_only_color=False,
+        max_input_bytes=8 * 1024 * 1024,
+        max_input_pixels=40_000_000,
+        control_rate=0.0,
+    ):
+        self.max_dim = max_dim
+        self.quality = quality
+        self.red_only_color = red_only_color
+        self.max_input_bytes = max_input_bytes
+        self.max_input_pixels = max_input_pixels
+        self.control_rate = control_rate
+        self.lock = threading.Lock()
+        self.stats = {
+            "frames": 0,
+            "unchanged": 0,  # recompressing would not have made them smaller
+            "control": 0,
+            "rejected": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "total_ms": 0.0,
+        }
+        # count, total seconds of upstream calls
+        self.upstream = {"processed": [0, 0.0], "control": [0, 0.0]}
+
+    def check_size(self, image_data):
+        size = decoded_size(image_data)
+        if size > self.max_input_bytes:
+            with self.lock:
+                self.stats["rejected"] += 1
+            raise FrameTooLarge(f"Frame is {size} bytes, limit is {self.max_input_bytes}")
+
+    def prepare(self, image_data):
+        """Returns (frame to send, report)."""
+        raw = frame_bytes(image_data)
+        if self.control_rate and random.random() < self.control_rate:
+            with self.lock:
+                self.stats["control"] += 1
+            return image_data, {"control": True, "bytes_in": len(raw), "bytes_out": len(raw)}
+
+        start = time.perf_counter()
+        image = Image.open(io.BytesIO(raw))
+        # Only the header has been read so far
+        if image.width * image.height > self.max_input_pixels:
+            with self.lock:
+                self.stats["rejected"] += 1
+            raise FrameTooLarge(f"Frame is {image.width}x{image.height}, limit is {self.max_input_pixels} pixels")
+
+        # Let the JPEG decoder scale down by a power of two before resampling
+        image.draft("RGB", (self.max_dim, self.max_dim))
+        image = image.convert("RGB")
+        image.thumbnail((self.max_dim, self.max_dim))
+        if self.red_only_color:
+            image = keep_red(image)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=self.quality)
+        frame = buffer.getvalue()
+
+        unchanged = len(frame) >= len(raw)
+        if unchanged:
+            frame = image_data
+        size_out = len(raw) if unchanged else len(frame)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.stats["frames"] += 1
+            self.stats["unchanged"] += unchanged
+            self.stats["bytes_in"] += len(raw)
+            self.stats["bytes_out"] += size_out
+            self.stats["total_ms"] += elapsed_ms
+        return frame, {
+            "bytes_in": len(raw),
+            "bytes_out": size_out,
+            "bytes_saved": len(raw) - size_out,
+            "size": list(image.size),
+            "ms": elapsed_ms,
+        }
+
+    def record_upstream(self, report, seconds):
+        report["upstream_ms"] = seconds * 1000
+        with self.lock:
+            totals = self.upstream["control" if report.get("control") else "processed"]
+            totals[0] += 1
+            totals[1] += seconds
+
+    def info(self):
+        with self.lock:
+            stats = dict(self.stats)
+            means = {
+                group: totals[1] * 1000 / totals[0] if totals[0] else None
+                for group, totals in self.upstream.items()
+            }
+        processed, control = means["processed"], means["control"]
+        return {
+            **stats,
+            "max_dim": self.max_dim,
+            "quality": self.quality,
+            "red_only_color": self.red_only_color,
+            "bytes_saved": stats["bytes_in"] - stats["bytes_out"],
+            "saved_ratio": 1 - stats["bytes_out"] / stats["bytes_in"] if stats["bytes_in"] else None,
+            "mean_ms": stats["total_ms"] / stats["frames"] if stats["frames"] else 0.0,
+            "upstream_ms": processed,
+            "control_upstream_ms": control,
+            "upstream_change_ms": processed - control if processed is not None and control is not None else None,
+        }
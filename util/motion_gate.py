@@ -0,0 +1,99 @@
+import io
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from util.vision_cache import frame_bytes
+
+
+def thumbnail(raw, size):
+    image = Image.open(io.BytesIO(raw))
+    image.draft("L", (size[0] * 2, size[1] * 2))
+    return np.asarray(image.convert("L").resize(size, Image.BILINEAR), dtype=np.float32)
+
+
+class MotionGate:
+    """Skips the vision call for cameras whose scene has not changed.
+
+    Each camera keeps a small grayscale thumbnail of the last frame that was
+    sent upstream, with that frame's result. The score of a new frame is the
+    fraction of thumbnail pixels that moved by more than `pixel_delta` gray
+    levels; under `threshold` the stored result is reused, until
+    `refresh_every` frames in a row have been gated.
+    """
+
+    def __init__(self, threshold=0.01, pixel_delta=12, refresh_every=30, size=(32, 24), max_cameras=1024):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.refresh_every = refresh_every
+        self.size = size
+        self.max_cameras = max_cameras
+        self.cameras = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"gated": 0, "forwarded": 0, "new": 0, "motion": 0, "refresh": 0, "total_ms": 0.0}
+
+    def check(self, camera_id, image_data):
+        """Returns (report, features); report["result"] is set when the frame is gated."""
+        start = time.perf_counter()
+        features = thumbnail(frame_bytes(image_data), self.size)
+        with self.lock:
+            state = self.cameras.get(camera_id)
+            if state is None or state["result"] is None:
+                reason, score = "new", None
+            else:
+                self.cameras.move_to_end(camera_id)
+                score = float((np.abs(features - state["reference"]) > self.pixel_delta).mean())
+                state["last_score"] = score
+                if score >= self.threshold:
+                    reason = "motion"
+                elif state["since_forward"] + 1 >= self.refresh_every:
+                    reason = "refresh"
+                else:
+                    reason = None
+                    state["since_forward"] += 1
+                    state["gated"] += 1
+            self.stats["gated" if reason is None else "forwarded"] += 1
+            if reason is not None:
+                self.stats[reason] += 1
+            self.stats["total_ms"] += (time.perf_counter() - start) * 1000
+
+        report = {"gated": reason is None, "reason": reason, "score": score}
+        if reason is None:
+            report["result"] = state["result"]
+        return report, features
+
+    def record(self, camera_id, features, result):
+        # The forwarded frame becomes the camera's new reference
+        with self.lock:
+            state = self.cameras.get(camera_id)
+            if state is None:
+                state = self.cameras[camera_id] = {"gated": 0, "forwarded": 0, "last_score": None}
+            self.cameras.move_to_end(camera_id)
+            state.update(reference=features, result=result, since_forward=0)
+            state["forwarded"] += 1
+            while len(self.cameras) > self.max_cameras:
+                self.cameras.popitem(last=False)
+
+    def info(self):
+        with self.lock:
+            frames = self.stats["gated"] + self.stats["forwarded"]
+            return {
+                **self.stats,
+                "threshold": self.threshold,
+                "pixel_delta": self.pixel_delta,
+                "refresh_every": self.refresh_every,
+                "gated_ratio": self.stats["gated"] / frames if frames else None,
+                "mean_ms": self.stats["total_ms"] / frames if frames else 0.0,
+                "cameras": {
+                    str(camera_id): {
+                        "gated": state["gated"],
+                        "forwarded": state["forwarded"],
+                        "last_score": state["last_score"],
+                        "last_message": state["result"].get("message"),
+                    }
+                    for camera_id, state in self.cameras.items()
+                },
+            }
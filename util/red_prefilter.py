@@ -0,0 +1,100 @@
+import io
+import logging
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from util.vision_cache import frame_bytes
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "shadow", "gate")
+
+
+def red_mask(pixels, min_red=110, dominance=1.6):
+    """Pixels (int16 RGB array) that are bright red and clearly redder than green and blue."""
+    r, g, b = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+    scaled = int(dominance * 10)
+    return (r >= min_red) & (r * 10 >= g * scaled) & (r * 10 >= b * scaled)
+
+
+class RedPrefilter:
+    """Cheap color-mask + blob check that rules out frames with no red figure."""
+
+    def __init__(self, mode="off", min_blob=0.002, min_red=110, dominance=1.6, max_side=128):
+        if mode not in MODES:
+            raise ValueError(f"Invalid prefilter mode {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        self.min_blob = min_blob  # smallest blob worth sending, as a fraction of the frame
+        self.min_red = min_red
+        self.dominance = dominance
+        self.max_side = max_side
+        if mode != "off":
+            # Pay for the scipy import up front rather than on the first frame
+            from scipy import ndimage  # noqa: F401
+        self.lock = threading.Lock()
+        self.stats = {
+            "frames": 0,
+            "passed": 0,
+            "rejected": 0,
+            "total_ms": 0.0,
+            "agree": 0,
+            "missed_yes": 0,  # prefilter rejected, model said YES
+            "extra_pass": 0,  # prefilter passed, model said NO
+        }
+
+    def check(self, image_data):
+        start = time.perf_counter()
+        image = Image.open(io.BytesIO(frame_bytes(image_data)))
+        # Let the JPEG decoder scale down for us; we only need a coarse mask
+        image.draft("RGB", (self.max_side, self.max_side))
+        pixels = np.asarray(image.convert("RGB"), dtype=np.int16)
+        mask = red_mask(pixels, self.min_red, self.dominance)
+
+        red_fraction = float(mask.mean())
+        blob_fraction = 0.0
+        if red_fraction >= self.min_blob:
+            from scipy import ndimage
+
+            labels, count = ndimage.label(mask)
+            if count:
+                blob_fraction = float(np.bincount(labels.ravel())[1:].max()) / mask.size
+
+        passed = blob_fraction >= self.min_blob
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.stats["frames"] += 1
+            self.stats["passed" if passed else "rejected"] += 1
+            self.stats["total_ms"] += elapsed_ms
+        return {
+            "passed": passed,
+            "red_fraction": red_fraction,
+            "blob_fraction": blob_fraction,
+            "ms": elapsed_ms,
+        }
+
+    def record_model(self, check, message):
+        model_yes = isinstance(message, str) and message.strip().upper().startswith("YES")
+        with self.lock:
+            if check["passed"] == model_yes:
+                self.stats["agree"] += 1
+                return
+            self.stats["extra_pass" if check["passed"] else "missed_yes"] += 1
+        logger.warning(
+            "Prefilter disagreed with model: prefilter=%s model=%s blob=%.4f",
+            "pass" if check["passed"] else "reject",
+            message,
+            check["blob_fraction"],
+        )
+
+    def info(self):
+        with self.lock:
+            compared = self.stats["agree"] + self.stats["missed_yes"] + self.stats["extra_pass"]
+            return {
+                **self.stats,
+                "mode": self.mode,
+                "mean_ms": self.stats["total_ms"] / self.stats["frames"] if self.stats["frames"] else 0.0,
+                "agreement": self.stats["agree"] / compared if compared else None,
+            }
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import deque
+
+
+class VisionBatcher:
+    """Gathers frames that arrive within `window` seconds and sends them as one request."""
+
+    def __init__(self, send_batch, window=0.25, max_batch=8, deadline=10.0):
+        self.send_batch = send_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.deadline = deadline
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.stats = {"frames": 0, "batches": 0, "deadline_exceeded": 0}
+        self.thread = threading.Thread(target=self._loop, name="vision-batcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, image_data, priority="camera", deadline=None):
+        item = {
+            "image": image_data,
+            "priority": priority,
+            "deadline": deadline,
+            "arrived": time.monotonic(),
+            "result": None,
+            "done": threading.Event(),
+        }
+        with self.cond:
+            self.queue.append(item)
+            self.stats["frames"] += 1
+            self.cond.notify()
+
+        if not item["done"].wait(self.deadline):
+            with self.cond:
+                self.stats["deadline_exceeded"] += 1
+            return {"error": "Vision batch deadline exceeded"}
+        return item["result"]
+
+    def _take_batch(self):
+        with self.cond:
+            while not self.queue:
+                self.cond.wait()
+            # The window is measured from the oldest waiting frame
+            flush_at = self.queue[0]["arrived"] + self.window
+            while len(self.queue) < self.max_batch:
+                remaining = flush_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            count = min(len(self.queue), self.max_batch)
+            batch = [self.queue.popleft() for _ in range(count)]
+            self.stats["batches"] += 1
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._take_batch()
+            threading.Thread(target=self._send, args=(batch,), daemon=True).start()
+
+    def _send(self, batch):
+        now = time.monotonic()
+        # Frames whose caller already gave up are not worth sending
+        live = [item for item in batch if now - item["arrived"] < self.deadline]
+        try:
+            # Deadlines are what each caller has left once the batch goes out
+            results = (
+                self.send_batch(
+                    [item["image"] for item in live],
+                    [item["priority"] for item in live],
+                    [None if item["deadline"] is None else item["deadline"] - (now - item["arrived"]) for item in live],
+                )
+                if live
+                else []
+            )
+        except Exception as e:
+            results = [{"error": str(e)}] * len(live)
+        for item, result in zip(live, results):
+            item["result"] = result
+            item["done"].set()
+
+    def info(self):
+        with self.cond:
+            return {
+                **self.stats,
+                "queued": len(self.queue),
+                "mean_batch_size": self.stats["frames"] / self.stats["batches"] if self.stats["batches"] else 0.0,
+                "window": self.window,
+                "max_batch": self.max_batch,
+                "deadline": self.deadline,
+            }
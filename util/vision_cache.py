@@ -0,0 +1,196 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+
+def frame_bytes(image_data):
+    if isinstance(image_data, str):
+        return base64.b64decode(image_data)
+    return image_data
+
+
+def exact_hash(raw):
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def perceptual_hash(raw):
+    # 64-bit difference hash: compare neighbouring pixels of a 9x8 grayscale thumbnail
+    image = Image.open(io.BytesIO(raw))
+    image.draft("L", (64, 64))
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+class VisionCache:
+    """LRU + TTL cache of vision results keyed by frame content.
+
+    With `disk_dir` every result is also written there as one JSON file. The
+    disk tier keeps at most `disk_max_entries` files and drops expired ones,
+    oldest first, whenever it writes.
+    """
+
+    def __init__(self, max_entries=256, ttl=30.0, phash_distance=None, disk_dir=None, disk_max_entries=4096):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # None disables the perceptual lookup; 0 means identical dHash only
+        self.phash_distance = phash_distance
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self.entries = OrderedDict()
+        # key -> stored_at of the files on disk, oldest first
+        self.disk_entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "phash_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self.disk_evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            found = []
+            for name in os.listdir(disk_dir):
+                if name.endswith(".json"):
+                    try:
+                        found.append((os.path.getmtime(os.path.join(disk_dir, name)), name[: -len(".json")]))
+                    except OSError:
+                        pass
+            for stored_at, key in sorted(found):
+                self.disk_entries[key] = stored_at
+            self._remove_files(self._prune_disk(time.time()))
+
+    def keys_for(self, image_data):
+        raw = frame_bytes(image_data)
+        phash = None
+        if self.phash_distance is not None:
+            try:
+                phash = perceptual_hash(raw)
+            except Exception:
+                phash = None
+        return exact_hash(raw), phash
+
+    def get(self, key, phash=None):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry["stored_at"] <= self.ttl:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry["result"]
+
+            if phash is not None:
+                match = self._nearest(phash, now)
+                if match is not None:
+                    self.entries.move_to_end(match)
+                    self.stats["phash_hits"] += 1
+                    return self.entries[match]["result"]
+
+        entry = self._read_disk(key, now)
+        with self.lock:
+            if entry is not None:
+                self._insert(key, entry)
+                self.stats["disk_hits"] += 1
+                return entry["result"]
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key, result, phash=None):
+        entry = {
+            "stored_at": time.time(),
+            "phash": phash,
+            "result": {"message": result.get("message"), "is_off": result.get("is_off")},
+        }
+        with self.lock:
+            self._insert(key, entry)
+        self._write_disk(key, entry)
+
+    def _insert(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _nearest(self, phash, now):
+        best, best_distance = None, self.phash_distance + 1
+        for key, entry in self.entries.items():
+            if entry["phash"] is None or now - entry["stored_at"] > self.ttl:
+                continue
+            distance = (entry["phash"] ^ phash).bit_count()
+            if distance < best_distance:
+                best, best_distance = key, distance
+        return best
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - entry["stored_at"] > self.ttl:
+            return None
+        return entry
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            with open(path + ".tmp", "w") as f:
+                json.dump(entry, f)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            return
+        with self.lock:
+            self.disk_entries.pop(key, None)
+            self.disk_entries[key] = entry["stored_at"]
+            stale = self._prune_disk(entry["stored_at"])
+        self._remove_files(stale)
+
+    def _prune_disk(self, now):
+        # Keys whose files should go: expired ones, then the oldest beyond the cap
+        stale = []
+        while self.disk_entries:
+            key, stored_at = next(iter(self.disk_entries.items()))
+            if now - stored_at <= self.ttl and len(self.disk_entries) <= self.disk_max_entries:
+                break
+            del self.disk_entries[key]
+            stale.append(key)
+        self.disk_evictions += len(stale)
+        return stale
+
+    def _remove_files(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            stale = list(self.disk_entries)
+            self.disk_entries.clear()
+        self._remove_files(stale)
+
+    def info(self):
+        with self.lock:
+            lookups = sum(self.stats.values()) - self.stats["evictions"]
+            hits = lookups - self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self.entries),
+                "disk_entries": len(self.disk_entries),
+                "disk_evictions": self.disk_evictions,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
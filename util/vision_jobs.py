@@ -0,0 +1,91 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class VisionJobs:
+    """Runs vision calls on a bounded worker pool so request threads return right away."""
+
+    def __init__(self, process, max_workers=4, max_pending=32, keep_finished=256):
+        self.process = process
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="vision-job"
+        )
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.pending = 0
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, image_data, on_done=None, **kwargs):
+        # Returns None when the pool is saturated so the caller can answer 503
+        with self.lock:
+            if self.pending >= self.max_pending:
+                return None
+            self.pending += 1
+            job = {
+                "id": uuid.uuid4().hex,
+                "status": "queued",
+                "submitted_at": time.time(),
+                "finished_at": None,
+                "result": None,
+                "done": threading.Event(),
+            }
+            self.jobs[job["id"]] = job
+            self._trim()
+        self.executor.submit(self._run, job, image_data, on_done, kwargs)
+        return job["id"]
+
+    def _run(self, job, image_data, on_done, kwargs):
+        job["status"] = "running"
+        try:
+            result = self.process(image_data, **kwargs)
+        except Exception as e:
+            result = {"error": str(e)}
+        job["result"] = result
+        job["status"] = "error" if "error" in result else "done"
+        job["finished_at"] = time.time()
+        try:
+            if on_done is not None:
+                on_done(result)
+        finally:
+            with self.lock:
+                self.pending -= 1
+            job["done"].set()
+
+    def _trim(self):
+        # Forget the oldest finished jobs once we hold more than keep_finished
+        finished = [
+            job_id for job_id, job in self.jobs.items() if job["done"].is_set()
+        ]
+        for job_id in finished[: max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def wait(self, job_id, timeout=None):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job["done"].wait(timeout)
+        return job
+
+    @staticmethod
+    def describe(job):
+        info = {
+            "id": job["id"],
+            "status": job["status"],
+            "submitted_at": job["submitted_at"],
+            "finished_at": job["finished_at"],
+        }
+        result = job["result"]
+        if result is not None:
+            if "error" in result:
+                info["error"] = result["error"]
+            else:
+                info["result"] = result.get("message")
+        return info
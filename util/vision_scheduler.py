@@ -0,0 +1,143 @@
+import heapq
+import itertools
+import threading
+import time
+
+# Lower runs first: drone confirmations escalate the alarm, camera frames are routine
+PRIORITIES = {"drone_final": 0, "drone": 1, "camera": 2}
+
+
+class TokenBucket:
+    """Refills at `per_minute` / 60 per second up to `per_minute`; may go into debt."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        self.refill(now)
+        self.level -= amount
+
+
+class VisionScheduler:
+    """Admits upstream vision calls by priority, within rate limits and deadlines.
+
+    Callers queue in a heap ordered by priority class then arrival. The head
+    goes once an in-flight slot is free and the request and token buckets
+    allow it. Token use is only known after the call, so admission waits for
+    the running mean per frame times the frames in the call, and actual usage
+    is charged afterwards. A call still queued at its deadline is dropped.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, max_inflight=8, deadline=10.0, tokens_per_frame=1000):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_inflight = max_inflight
+        self.deadline = deadline
+        self.tokens_per_frame = float(tokens_per_frame)
+        self.queue = []
+        self.order = itertools.count()
+        self.inflight = 0
+        self.cond = threading.Condition()
+        self.stats = {
+            name: {"admitted": 0, "dropped": 0, "wait_seconds": 0.0, "max_depth": 0} for name in PRIORITIES
+        }
+        self.tokens_used = 0
+
+    def run(self, func, priority="camera", deadline=None, frames=1):
+        """Runs one upstream call carrying `frames` images once it is admitted."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {tuple(PRIORITIES)}")
+        if not self._admit(priority, self.deadline if deadline is None else deadline, frames):
+            return {"error": "Frame dropped: deadline passed while queued", "status": 504, "dropped": True}
+        try:
+            return func()
+        finally:
+            with self.cond:
+                self.inflight -= 1
+                self.cond.notify_all()
+
+    def _budget_wait(self, now, frames):
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.wait_time(1, now))
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.wait_time(self.tokens_per_frame * frames, now))
+        return wait
+
+    def _admit(self, priority, deadline, frames):
+        arrived = time.monotonic()
+        expires = arrived + deadline
+        entry = (PRIORITIES[priority], next(self.order))
+        stats = self.stats[priority]
+        with self.cond:
+            heapq.heappush(self.queue, entry)
+            depth = sum(1 for rank, _ in self.queue if rank == entry[0])
+            stats["max_depth"] = max(stats["max_depth"], depth)
+            while True:
+                now = time.monotonic()
+                if now >= expires:
+                    self.queue.remove(entry)
+                    heapq.heapify(self.queue)
+                    stats["dropped"] += 1
+                    self.cond.notify_all()
+                    return False
+                wait = None
+                if self.queue[0] == entry and self.inflight < self.max_inflight:
+                    wait = self._budget_wait(now, frames)
+                    if wait == 0:
+                        heapq.heappop(self.queue)
+                        self.inflight += 1
+                        if self.request_bucket is not None:
+                            self.request_bucket.take(1, now)
+                        stats["admitted"] += 1
+                        stats["wait_seconds"] += now - arrived
+                        # The next in line may be able to go too
+                        self.cond.notify_all()
+                        return True
+                self.cond.wait(expires - now if wait is None else min(wait, expires - now))
+
+    def record_tokens(self, tokens, frames=1):
+        with self.cond:
+            self.tokens_used += tokens
+            if self.token_bucket is not None:
+                self.token_bucket.take(tokens, time.monotonic())
+            # Running estimate used to hold back admission
+            self.tokens_per_frame = 0.9 * self.tokens_per_frame + 0.1 * tokens / max(frames, 1)
+
+    def info(self):
+        with self.cond:
+            depth = {name: 0 for name in PRIORITIES}
+            ranks = {rank: name for name, rank in PRIORITIES.items()}
+            for rank, _ in self.queue:
+                depth[ranks[rank]] += 1
+            return {
+                "queued": depth,
+                "inflight": self.inflight,
+                "max_inflight": self.max_inflight,
+                "deadline": self.deadline,
+                "tokens_used": self.tokens_used,
+                "tokens_per_frame": round(self.tokens_per_frame, 1),
+                "classes": {
+                    name: {
+                        **stats,
+                        "mean_wait_ms": stats["wait_seconds"] * 1000 / stats["admitted"] if stats["admitted"] else 0.0,
+                    }
+                    for name, stats in self.stats.items()
+                },
+                "requests_per_minute": self.request_bucket.capacity if self.request_bucket else None,
+                "tokens_per_minute": self.token_bucket.capacity if self.token_bucket else None,
+            }